@@ -1,3 +1,4 @@
+import startup_report
 import os
 from pathlib import Path
 import sys
@@ -24,29 +25,90 @@ def get_user_choice():
             return choice
         print("Invalid input. Please try again.")
 
+SOLVE_TIMEOUT = 30.0  # Seconds to search before giving up on a grid (usually a misread one) instead of hanging.
+
+def report_progress(nodes, depth, elapsed):
+    print(f"Still searching... {nodes} nodes visited, depth {depth}, {elapsed:.0f} s elapsed.", flush=True)
+
+def check_solution_count(board):
+    """Returns 0, 1 or 2 (meaning several) solutions, or None if counting took longer than SOLVE_TIMEOUT."""
+    from solve_sudoku import count_solutions
+    from solver_limits import SearchBudget, SearchInterrupted
+    try:
+        return count_solutions(board, budget=SearchBudget(timeout=SOLVE_TIMEOUT))
+    except SearchInterrupted:
+        return None
+
+def solve_or_give_up(initial_board):
+    """Solves within SOLVE_TIMEOUT, printing progress while the search runs. Returns a SolveResult."""
+    from solve_sudoku import solve_with_limits
+    result = solve_with_limits(initial_board, timeout=SOLVE_TIMEOUT, progress=report_progress, progress_interval=20000)
+    startup_report.mark("solved")
+    if result.status == "budget_exceeded":
+        print(f"Gave up after {SOLVE_TIMEOUT:.0f} seconds. The grid was probably misread; please check test.txt.")
+    elif not result:
+        print("There is no solution.")
+    return result
+
+def recover_misreads(extraction):
+    """
+    Returns the board to use for a photo: the recognized one if it has exactly one solution,
+    otherwise the most probable reading that has (printing which cells were changed), or
+    the recognized one again if no reading works.
+    """
+    board = extraction["board"]
+    if check_solution_count(board) == 1:
+        return board
+    from confidence_solver import recover_grid
+    recovered = recover_grid(extraction["candidates"], extraction["candidate_probabilities"])
+    if recovered is None:
+        return board
+    print("\nThe recognized grid does not have exactly one solution. The most probable reading that does changes:")
+    for row, col, read, used in recovered.corrections:
+        print(f"  row {row}, column {col}: {read or 'empty'} -> {used or 'empty'}")
+    return recovered.board
+
+USAGE = "Usage: python Combined_full.py [image_path [--debug] [--size N]]  (N is 9, 16, 25, ...)"
+
+def parse_grid_size(args):
+    """Returns the value of --size in args (9 without it), or exits with the usage message if it is not a square of a square."""
+    if "--size" not in args:
+        return 9
+    position = args.index("--size") + 1
+    try:
+        size = int(args[position])
+    except (IndexError, ValueError):
+        sys.exit(f"--size needs a whole number.\n{USAGE}")
+    box = int(round(size ** 0.5))
+    if box < 2 or box * box != size:
+        sys.exit(f"--size must be the square of a box size (9, 16, 25, ...), got {size}.\n{USAGE}")
+    return size
+
 if len(sys.argv) > 1:
-    from tensorflow.keras.models import load_model
+    # Pass --debug after the image path to also write the warped grid and the cell crops to disk,
+    # and --size 16 (or 25, ...) for grids larger than 9x9.
+    image_path = sys.argv[1]
+    debug_dir = current_dir if "--debug" in sys.argv[2:] else None
+    grid_size = parse_grid_size(sys.argv[2:])
+    if not os.path.isfile(image_path):
+        sys.exit(f"Image not found: {image_path}")
+
+    # Heavy libraries are imported stage by stage, only once the input has been checked.
     import cv2
-    import numpy as np
-    import Preprocessing_full
-    from utils_MNIST_Classify import predict_user_image_with_empty_check
+    image = cv2.imread(image_path)
+    if image is None:
+        sys.exit(f"Could not read image {image_path}.")
+    startup_report.mark("image read")
 
-    image_path = sys.argv[1]
-    extracted = Preprocessing_full.extract_sudoku(image_path)
-    cv2.imwrite('extracted_sudoku.jpg', extracted)
+    from utils_MNIST_Classify import load_model
+    from sudoku_pipeline import process_image
+
+    model_mnist = load_model('trained_model_classification_MNIST.npz')
+    startup_report.mark("model loaded")
+    extraction = process_image(image, model_mnist, debug_dir=debug_dir, size=grid_size)
+    sudoku_grid = recover_misreads(extraction)
+    startup_report.mark("grid recognized")
 
-    model_mnist = load_model('trained_model_classification_MNIST.keras')
-    sudoku_grid = np.zeros((9, 9), dtype=int)
-    folder_path = "sudoku_digits"
-    
-    for i in range(1, 82):
-        image_file = f"digit_{i}.png"
-        image_path = os.path.join(folder_path, image_file)
-        if os.path.exists(image_path):
-            result = predict_user_image_with_empty_check(image_path, model_mnist)
-            row, col = (i - 1) // 9, (i - 1) % 9
-            sudoku_grid[row, col] = result
-    
     check_or_create_text_file()
     with open("test.txt", "w") as file:
         file.write("[\n")
@@ -55,41 +117,53 @@ if len(sys.argv) > 1:
         file.write("]")
     
     
-    from solve_sudoku import load_sudoku_from_file, print_board, solve_board, interactive_sudoku
+    from solve_sudoku import load_sudoku_from_file, print_board, interactive_sudoku
     initial_board = load_sudoku_from_file("test.txt")
     print("\nLoaded Sudoku Grid:\n")
     print_board(initial_board)
+    if check_solution_count(initial_board) != 1:
+        print("Warning: the recognized grid does not have exactly one solution, so some digits were probably misread.")
+        print("You can correct test.txt before making your choice.")
 
     choice = get_user_choice()
     if choice == '2':
         sys.exit("Exiting without solving the puzzle.")
 
-    from solve_sudoku import load_sudoku_from_file, print_board, solve_board, interactive_sudoku
     import time
 
     initial_board = load_sudoku_from_file("test.txt")
     print("\nLoaded Sudoku Grid:\n")
     print_board(initial_board)
+
+    # Reject misread grids before the interactive session checks guesses against a wrong solution.
+    solution_count = check_solution_count(initial_board)
+    if solution_count == 0:
+        sys.exit("The grid has no solution. Some digits were probably misread; please correct test.txt and try again.")
+    if solution_count is None:
+        sys.exit("Could not check the grid in time. Some digits were probably misread; please correct test.txt and try again.")
+    if solution_count > 1:
+        sys.exit("The grid has more than one solution. Some digits were probably missed; please correct test.txt and try again.")
     start_time = time.time()
 
-    solved_board = initial_board.copy()
-    
-    if solve_board(solved_board):
+    result = solve_or_give_up(initial_board)
+    if result:
         end_time = time.time()
         print(f"Execution Time: {end_time - start_time:.6f} seconds")
-        interactive_sudoku(initial_board, solved_board)
-    else:
-        print("There is no solution.")
+        interactive_sudoku(initial_board, result.solution, grid_image=extraction["warped"], solve_stats=result.stats,
+                           photo=image, homography=extraction["homography"])
 
 else:
     if not text_file_path.is_file():
         sys.exit("File not found. Please make sure that test.txt exists.")
     
-    from solve_sudoku import load_sudoku_from_file, print_board, solve_board, interactive_sudoku
+    from solve_sudoku import load_sudoku_from_file, print_board, interactive_sudoku
     
     initial_board = load_sudoku_from_file("test.txt")
+    startup_report.mark("grid loaded")
     print("\nLoaded Sudoku Grid:\n")
     print_board(initial_board)
+    if (check_solution_count(initial_board) or 0) > 1:
+        print("Note: this puzzle has more than one solution. Your guesses will be checked against one of them.")
 
     choice = get_user_choice()
     if choice == '2':
@@ -102,11 +176,9 @@ else:
     start_time = time.time()
     print("\nLoaded Sudoku Grid:\n")
     print_board(initial_board)
-    solved_board = initial_board.copy()
     
-    if solve_board(solved_board):
+    result = solve_or_give_up(initial_board)
+    if result:
         end_time = time.time()
         print(f"Execution Time: {end_time - start_time:.6f} seconds")
-        interactive_sudoku(initial_board, solved_board)
-    else:
-        print("There is no solution.")
\ No newline at end of file
+        interactive_sudoku(initial_board, result.solution, solve_stats=result.stats)
\ No newline at end of file
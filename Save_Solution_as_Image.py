@@ -1,50 +1,30 @@
-import cv2
-import numpy as np
-
-def save_as_image(original_board, current_board, solved_board, system_revealed_positions, user_guess_positions, incorrect_guess_positions):
-    # Load the extracted Sudoku image.
-    initial_board_image = cv2.imread("extracted_sudoku.jpg")
-
-    # Define text overlay parameters (OpenCV uses BGR format).
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    font_scale = 1  # Adjust based on image resolution.
-    thickness = 2
-
-    # Colors in BGR:
-    color_auto_fill = (0, 255, 0)       # Green for auto-solved (solver-filled) numbers.
-    color_system_reveal = (255, 0, 255)   # Magenta for cells revealed by the system (option 1).
-    color_user_guess = (255, 255, 0)      # Cyan for user-entered correct guesses (option 4).
-    color_incorrect = (0, 0, 255)         # Red for incorrect user guesses.
-
-    # Assuming a square grid, determine the cell size.
-    grid_size = initial_board_image.shape[0] // 9
-
-    # Iterate over each cell.
-    for row in range(9):
-        for col in range(9):
-            # Do not augment cells that were pre-filled in the original puzzle.
-            if original_board[row, col] != 0:
-                continue
-
-            # Calculate the overlay position.
-            x = col * grid_size + grid_size // 4
-            y = row * grid_size + int(grid_size * 0.8)
-
-            # Determine the color based on the origin of the filled number.
-            if (row, col) in incorrect_guess_positions:
-                number = current_board[row, col]
-                cv2.putText(initial_board_image, str(number), (x, y), font, font_scale, color_incorrect, thickness)
-            elif (row, col) in user_guess_positions:
-                number = current_board[row, col]
-                cv2.putText(initial_board_image, str(number), (x, y), font, font_scale, color_user_guess, thickness)
-            elif (row, col) in system_revealed_positions:
-                number = current_board[row, col]
-                cv2.putText(initial_board_image, str(number), (x, y), font, font_scale, color_system_reveal, thickness)
-            else:
-                # For cells that are auto-filled by the solver.
-                number = solved_board[row, col]
-                cv2.putText(initial_board_image, str(number), (x, y), font, font_scale, color_auto_fill, thickness)
-
-    # Save the final augmented Sudoku image.
-    cv2.imwrite("solved_sudoku.png", initial_board_image)
-    print("Solved Sudoku image saved as solved_sudoku.png")
\ No newline at end of file
+import os
+
+from solution_renderer import render_boards, render_on_photos, write_images
+
+def render_solution(original_board, current_board, solved_board, system_revealed_positions, user_guess_positions, incorrect_guess_positions,
+                    grid_image=None):
+    """Draws the filled-in numbers onto a copy of the grid image and returns it (BGR).
+       Without a grid image (e.g. for a puzzle loaded from test.txt) a blank grid is used."""
+    # The colors follow the interactive board: green for solver-filled cells, magenta for system reveals,
+    # cyan for correct guesses and red for incorrect ones; pre-filled cells are left alone.
+    marks = (system_revealed_positions, user_guess_positions, incorrect_guess_positions)
+    return render_boards([original_board], [solved_board], [grid_image], [current_board], [marks])[0]
+
+def save_as_image(original_board, current_board, solved_board, system_revealed_positions, user_guess_positions, incorrect_guess_positions,
+                  grid_image=None, output_path="solved_sudoku.png", photo=None, homography=None):
+    """Saves the rendered solution to output_path. Given the photo and the homography from the pipeline,
+       the numbers are also drawn onto the photo and saved next to it with a _photo suffix."""
+    marks = (system_revealed_positions, user_guess_positions, incorrect_guess_positions)
+    images = [render_solution(original_board, current_board, solved_board, *marks, grid_image)]
+    paths = [output_path]
+    if photo is not None and homography is not None:
+        images += render_on_photos([original_board], [solved_board], [photo], [homography], [current_board], [marks])
+        stem, extension = os.path.splitext(output_path)
+        paths.append(f"{stem}_photo{extension}")
+
+    # Save the final augmented Sudoku image(s).
+    write_images(images, paths)
+    for path in paths:
+        print(f"Solved Sudoku image saved as {path}")
+    return paths
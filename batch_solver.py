@@ -0,0 +1,142 @@
+"""
+Vectorized solver for many 9x9 boards at once.
+
+The boards are held as an (N, 9, 9, 9) candidate tensor (board, row, column,
+digit), stored with the digit axis packed into 9-bit masks. Elimination, naked singles and hidden singles run on all
+boards with whole-array operations until nothing changes; only the few boards
+that propagation alone cannot finish are handed to the per-board bitmask
+engine.
+
+The gain over looping bitmask_solver.solve_cells is modest, not orders of
+magnitude: on 2000 generated puzzles it was about 3.5x (130 vs 450 us a board)
+for puzzles singles can finish and about 1.3x for hard ones, whose guessing
+still runs one board at a time in Python.
+"""
+import numpy as np
+
+import bitmask_solver
+
+ALL_DIGITS = 0x1FF  # Bit d-1 set means digit d is still possible.
+POPCOUNT = np.array([bin(mask).count("1") for mask in range(512)], dtype=np.uint8)
+BIT_TO_DIGIT = np.zeros(512, dtype=np.int8)
+BIT_TO_DIGIT[1 << np.arange(9)] = np.arange(1, 10)
+
+
+def _box_cells(tensor):
+    """Regroups an (M, 9, 9) grid as (M, box, cell in box)."""
+    return tensor.reshape(len(tensor), 3, 3, 3, 3).transpose(0, 1, 3, 2, 4).reshape(len(tensor), 9, 9)
+
+
+def _expand_boxes(per_box):
+    """Broadcasts an (M, 9) per-box array back to every cell: (M, 9, 9)."""
+    return per_box.reshape(len(per_box), 3, 3).repeat(3, axis=1).repeat(3, axis=2)
+
+
+def _unit_singles(units):
+    """
+    For (M, units, 9 cells) candidate masks returns, per unit, the digits that
+    fit in exactly one cell and the digits that fit nowhere.
+    """
+    once = np.zeros(units.shape[:2], dtype=np.uint16)
+    twice = np.zeros_like(once)
+    for cell in range(units.shape[2]):
+        twice |= once & units[:, :, cell]
+        once |= units[:, :, cell]
+    return once & ~twice, ALL_DIGITS & ~once
+
+
+def _has_duplicates(fixed_units):
+    """True for boards where some unit holds the same placed digit twice."""
+    placed = POPCOUNT[fixed_units].sum(axis=2, dtype=np.int16)
+    distinct = POPCOUNT[np.bitwise_or.reduce(fixed_units, axis=2)]
+    return (placed != distinct).any(axis=1)
+
+
+def propagate(candidates):
+    """
+    Runs elimination plus naked and hidden singles on an (N, 9, 9) stack of
+    candidate masks until every board reaches a fixed point. The masks are the
+    (N, 9, 9, 9) boolean candidate tensor with the digit axis packed into 9
+    bits, which cuts memory traffic ninefold. Boards that stop changing are
+    dropped from the working set, so the cost shrinks as they settle.
+
+    Returns the propagated candidates and an (N,) mask of boards that hit a
+    contradiction.
+    """
+    candidates = candidates.copy()
+    broken = np.zeros(len(candidates), dtype=bool)
+    active = np.arange(len(candidates))
+
+    while len(active):
+        current = candidates[active]
+        fixed = np.where(POPCOUNT[current] == 1, current, 0).astype(np.uint16)
+
+        # Elimination: a placed digit is removed from every peer in its row, column and box.
+        fixed_cols = fixed.transpose(0, 2, 1)
+        fixed_boxes = _box_cells(fixed)
+        bad = _has_duplicates(fixed) | _has_duplicates(fixed_cols) | _has_duplicates(fixed_boxes)
+        taken = (np.bitwise_or.reduce(fixed, axis=2)[:, :, None]
+                 | np.bitwise_or.reduce(fixed_cols, axis=2)[:, None, :]
+                 | _expand_boxes(np.bitwise_or.reduce(fixed_boxes, axis=2)))
+        updated = (current & ~taken) | fixed
+
+        # Hidden singles: a digit with exactly one possible cell in a unit goes there.
+        row_single, row_missing = _unit_singles(updated)
+        col_single, col_missing = _unit_singles(updated.transpose(0, 2, 1))
+        box_single, box_missing = _unit_singles(_box_cells(updated))
+        bad |= (row_missing | col_missing | box_missing).any(axis=1)
+        hidden = updated & (row_single[:, :, None] | col_single[:, None, :] | _expand_boxes(box_single))
+        bad |= (POPCOUNT[hidden] > 1).any(axis=(1, 2))  # Two digits forced into one cell.
+        updated = np.where(hidden != 0, hidden, updated)
+        bad |= (updated == 0).any(axis=(1, 2))  # A cell with no candidates left.
+
+        changed = (updated != current).any(axis=(1, 2))
+        candidates[active] = updated
+        broken[active[bad]] = True
+        active = active[changed & ~bad]
+
+    return candidates, broken
+
+
+def boards_to_candidates(boards):
+    """Builds the (N, 9, 9) candidate masks: givens have their own bit set, empty cells all nine."""
+    boards = np.asarray(boards)
+    givens = np.left_shift(1, np.maximum(boards, 1) - 1).astype(np.uint16)
+    return np.where(boards == 0, ALL_DIGITS, givens).astype(np.uint16)
+
+
+def candidates_to_boards(candidates):
+    """Reads the placed digits out of candidate masks (0 where a cell still has several candidates)."""
+    return BIT_TO_DIGIT[candidates].astype(int)
+
+
+def solve_boards(boards, chunk_size=4096):
+    """
+    Solves an (N, 9, 9) stack of boards.
+
+    Returns (solutions, solved): the solved boards (unsolvable ones are returned
+    unchanged) and an (N,) boolean mask of which boards were solved. Boards are
+    processed chunk_size at a time to bound the size of the candidate tensor.
+    """
+    boards = np.asarray(boards, dtype=int)
+    if boards.ndim != 3 or boards.shape[1:] != (9, 9):
+        raise ValueError(f"Expected boards of shape (N, 9, 9), got {boards.shape}")
+    solutions = boards.copy()
+    solved = np.zeros(len(boards), dtype=bool)
+
+    for start in range(0, len(boards), chunk_size):
+        chunk = boards[start:start + chunk_size]
+        candidates, broken = propagate(boards_to_candidates(chunk))
+        partial = candidates_to_boards(candidates)
+        complete = ~broken & (partial > 0).all(axis=(1, 2))
+        solutions[start:start + len(chunk)][complete] = partial[complete]
+        solved[start:start + len(chunk)][complete] = True
+
+        # Search only the boards propagation could neither finish nor rule out.
+        for offset in np.flatnonzero(~broken & ~complete):
+            board = partial[offset].copy()
+            if bitmask_solver.solve(board):
+                solutions[start + offset] = board
+                solved[start + offset] = True
+
+    return solutions, solved
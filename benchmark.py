@@ -0,0 +1,268 @@
+"""
+End-to-end benchmark over the bundled photo sets.
+
+    python benchmark.py                                   # easy/, moderate/ and hard/
+    python benchmark.py hard/ --repeat 5 --output bench.json
+    python benchmark.py --baseline bench.json             # exits with status 1 on a regression
+    python benchmark.py --write-ground-truth truth.json   # dump recognized grids to correct by hand
+    python benchmark.py --ground-truth truth.json         # also report recognition accuracy
+
+Every photo goes through the same stages as Combined_full.py, timed one by one:
+extraction (read, warp, grid-line removal, cell split), classification, solving
+and rendering. Per stage and per set the report holds p50/p90/p99 latencies,
+throughput, peak traced memory and, given ground-truth grids, cell and grid
+accuracy. Peak RSS is reported once, for the whole process.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS.
+    resource = None
+
+import cv2
+import numpy as np
+
+from bulk_solve import MODEL_PATH, iter_image_paths
+from puzzle_io import board_to_string, parse_puzzle_string
+from Save_Solution_as_Image import render_solution
+from solve_sudoku import solve_board
+from sudoku_pipeline import extract_grid, recognize_cells, remove_grid_lines, split_cells
+from utils_MNIST_Classify import load_model
+
+DEFAULT_SETS = ("easy", "moderate", "hard")
+STAGES = ("extract", "classify", "solve", "render", "total")
+DEFAULT_TOLERANCE = 0.25       # Allowed relative slowdown of a stage's p50 before it counts as a regression.
+DEFAULT_MIN_DELTA_MS = 1.0     # Slowdowns smaller than this never count, so sub-millisecond stages do not fail on noise.
+DEFAULT_ACCURACY_DROP = 0.005  # Allowed drop in cell accuracy before it counts as a regression.
+
+
+def run_photo(path, model, engine="bitmask"):
+    """
+    Runs one photo through every stage.
+    Returns (timings, board, solved) with the time of each stage in seconds.
+    """
+    timings = {}
+    started = time.perf_counter()
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError(f"Could not read image {path}.")
+    warped, _, _ = extract_grid(image)
+    crops = split_cells(remove_grid_lines(warped))
+    timings["extract"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    board, _ = recognize_cells(crops, model)
+    timings["classify"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    solution = board.copy()
+    solved = bool(solve_board(solution, engine))
+    timings["solve"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    render_solution(board, solution, solution, [], [], [], warped)
+    timings["render"] = time.perf_counter() - started
+
+    timings["total"] = sum(timings.values())
+    return timings, board, solved
+
+
+def summarize(samples):
+    """Latency statistics (in milliseconds) for a list of durations in seconds."""
+    values = np.asarray(samples) * 1000.0
+    if not len(values):
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "count": len(values),
+        "p50_ms": float(p50),
+        "p90_ms": float(p90),
+        "p99_ms": float(p99),
+        "mean_ms": float(values.mean()),
+        "max_ms": float(values.max()),
+    }
+
+
+def recognition_accuracy(recognized, ground_truth):
+    """Cell and whole-grid accuracy of recognized boards against the ground-truth grids that exist for them."""
+    pairs = [(board, parse_puzzle_string(ground_truth[path])) for path, board in recognized.items() if path in ground_truth]
+    if not pairs:
+        return None
+    correct_cells = sum(int((board == truth).sum()) for board, truth in pairs)
+    return {
+        "photos": len(pairs),
+        "cell_accuracy": correct_cells / (81 * len(pairs)),
+        "grid_accuracy": sum(bool((board == truth).all()) for board, truth in pairs) / len(pairs),
+    }
+
+
+def benchmark_set(paths, model, repeat=3, engine="bitmask", ground_truth=None):
+    """
+    Benchmarks one set of photos. Each photo runs once untimed to warm caches
+    and then repeat times; peak traced memory comes from one more pass.
+    Returns (report, recognized boards by path).
+    """
+    samples = {stage: [] for stage in STAGES}
+    recognized, failures, solved = {}, {}, 0
+
+    for path in paths:
+        try:
+            run_photo(path, model, engine)
+        except ValueError as error:
+            failures[path] = str(error)
+
+    paths = [path for path in paths if path not in failures]
+    wall_started = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            timings, board, ok = run_photo(path, model, engine)
+            for stage in STAGES:
+                samples[stage].append(timings[stage])
+            recognized[path] = board
+            solved += ok
+    wall = time.perf_counter() - wall_started
+
+    tracemalloc.start()
+    for path in paths:
+        run_photo(path, model, engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    runs = repeat * len(paths)
+    report = {
+        "photos": len(paths),
+        "runs": runs,
+        "failures": failures,
+        "solved_fraction": solved / runs if runs else 0.0,
+        "throughput_per_s": runs / wall if wall else 0.0,
+        "peak_traced_mb": peak / 2 ** 20,
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+        "accuracy": recognition_accuracy(recognized, ground_truth or {}),
+    }
+    return report, recognized
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE, accuracy_drop=DEFAULT_ACCURACY_DROP,
+                        min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    Lists every set/stage that got slower than the tolerance allows (and by more
+    than min_delta_ms), lost throughput or lost accuracy.
+    """
+    regressions = []
+    for name, current in results["sets"].items():
+        previous = baseline.get("sets", {}).get(name)
+        if previous is None:
+            continue
+        for stage, stats in current["stages"].items():
+            before = previous["stages"].get(stage, {}).get("p50_ms")
+            now = stats.get("p50_ms", 0.0)
+            if before and now > before * (1 + tolerance) and now - before > min_delta_ms:
+                regressions.append(f"{name}/{stage}: p50 {stats['p50_ms']:.2f} ms vs baseline {before:.2f} ms")
+        before = previous.get("throughput_per_s")
+        if before and current["throughput_per_s"] < before / (1 + tolerance):
+            regressions.append(f"{name}: throughput {current['throughput_per_s']:.1f}/s vs baseline {before:.1f}/s")
+        now, before = current.get("accuracy"), previous.get("accuracy")
+        if now and before and now["cell_accuracy"] < before["cell_accuracy"] - accuracy_drop:
+            regressions.append(f"{name}: cell accuracy {now['cell_accuracy']:.4f} vs baseline {before['cell_accuracy']:.4f}")
+        if len(current["failures"]) > len(previous.get("failures", {})):
+            regressions.append(f"{name}: {len(current['failures'])} photos failed extraction vs baseline {len(previous['failures'])}")
+    return regressions
+
+
+def process_peak_rss_mb():
+    """Peak resident memory of this whole process so far, or None where the resource module is missing."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, kilobytes on Linux.
+
+
+def environment():
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def print_report(results):
+    for name, report in results["sets"].items():
+        print(f"{name}: {report['photos']} photos, {report['throughput_per_s']:.1f} photos/s, "
+              f"peak traced {report['peak_traced_mb']:.1f} MB, {report['solved_fraction']:.0%} solved")
+        for stage, stats in report["stages"].items():
+            if stats["count"]:
+                print(f"  {stage:<9} p50 {stats['p50_ms']:8.2f} ms  p90 {stats['p90_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms")
+        if report["accuracy"]:
+            print(f"  accuracy  cells {report['accuracy']['cell_accuracy']:.2%}  grids {report['accuracy']['grid_accuracy']:.2%}"
+                  f" over {report['accuracy']['photos']} photos")
+        for path, error in report["failures"].items():
+            print(f"  failed    {path}: {error}")
+    if results["process_peak_rss_mb"] is not None:
+        print(f"process peak RSS {results['process_peak_rss_mb']:.1f} MB (all sets and the model)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction, classification, solving and rendering over photo sets.")
+    parser.add_argument("sets", nargs="*", default=list(DEFAULT_SETS), help="Directories of Sudoku photos (default: easy moderate hard).")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over every photo.")
+    parser.add_argument("--limit", type=int, help="Only use the first N photos of each set.")
+    parser.add_argument("--engine", default="bitmask", help="Solver engine passed to solve_board.")
+    parser.add_argument("--model", default=MODEL_PATH, help="Exported .npz classifier, or a .keras model to run with TensorFlow.")
+    parser.add_argument("--ground-truth", help="JSON file mapping photo paths to 81-character grids.")
+    parser.add_argument("--write-ground-truth", help="Write the recognized grids here in the --ground-truth format.")
+    parser.add_argument("--output", help="Save the results as JSON.")
+    parser.add_argument("--baseline", help="Results JSON to compare against; regressions make the exit status 1.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed relative slowdown (0.25 = 25%%).")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="Smallest p50 slowdown, in milliseconds, that counts as a regression.")
+    parser.add_argument("--accuracy-drop", type=float, default=DEFAULT_ACCURACY_DROP, help="Allowed drop in cell accuracy.")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+    model = load_model(args.model)
+    ground_truth = {}
+    if args.ground_truth:
+        with open(args.ground_truth) as file:
+            ground_truth = {os.path.normpath(path): grid for path, grid in json.load(file).items()}
+
+    results = {"environment": environment(), "config": {"repeat": args.repeat, "engine": args.engine, "model": args.model}, "sets": {}}
+    recognized = {}
+    for directory in args.sets:
+        paths = [os.path.normpath(path) for path in iter_image_paths(directory)][:args.limit]
+        report, boards = benchmark_set(paths, model, args.repeat, args.engine, ground_truth)
+        results["sets"][os.path.basename(os.path.normpath(directory))] = report
+        recognized.update(boards)
+    results["process_peak_rss_mb"] = process_peak_rss_mb()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.write_ground_truth:
+        with open(args.write_ground_truth, "w") as file:
+            json.dump({path: board_to_string(board) for path, board in recognized.items()}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare_to_baseline(results, json.load(file), args.tolerance, args.accuracy_drop, args.min_delta_ms)
+        if regressions:
+            print("REGRESSIONS against " + args.baseline + ":", file=sys.stderr)
+            for regression in regressions:
+                print("  " + regression, file=sys.stderr)
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Non-interactive bulk solving over a process pool.
+
+    python bulk_solve.py hard/                       # every image in a directory
+    python bulk_solve.py puzzles.txt --workers 16    # one puzzle per line (81 characters for 9x9)
+    python bulk_solve.py puzzles.sdkp                # packed binary puzzles (see puzzle_io)
+    python bulk_solve.py easy/ moderate/ hard/ --output results.jsonl
+
+Each puzzle produces one JSON line with its source, status ("solved",
+"unsolvable", "budget_exceeded" or "error"), the recognized grid, the solution
+and per-stage timings. --timeout caps the search time of each photo, so one
+misread grid cannot stall a worker. Solved photos also get a "solution_count"
+(2 meaning several). A photo whose recognized grid does not have exactly one
+solution is retried with the most probable reading that does; its record then
+also holds the "recognized" grid and the "corrections" made as
+[row, col, read, used] (0 for a dropped cell). Results are streamed as
+soon as a worker finishes them, so they do not come out in input order; use
+the "source" field to match them up.
+
+With --render DIR every solved puzzle is also drawn as a PNG in DIR: photos
+get the solution digits drawn onto the photo itself, puzzles from files a
+blank grid (rendered a chunk at a time, see solution_renderer). The record's
+"image" field holds the path.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from multiprocessing import Pool
+
+from puzzle_io import board_to_string, read_puzzles
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+MODEL_PATH = "trained_model_classification_MNIST.npz"
+
+_worker_model = None  # Classifier loaded once per worker process for image jobs.
+_worker_timeout = None  # Search time limit per photo, in seconds.
+_render_dir = None  # Directory solved puzzles are rendered into, if any.
+
+
+def solve_record(source, board, timings, timeout=None):
+    """Solves a parsed board (within timeout seconds, if given) and builds its result record."""
+    from solve_sudoku import solve_with_limits
+
+    result = solve_with_limits(board, timeout=timeout)
+    timings["solve"] = result.stats.elapsed
+    return {
+        "source": source,
+        "status": result.status,
+        "grid": board_to_string(board),
+        "solution": board_to_string(result.solution) if result else None,
+        "timings": timings,
+        "stats": result.stats.to_dict(),
+    }
+
+
+def error_record(source, error, timings=None):
+    return {"source": source, "status": "error", "error": f"{type(error).__name__}: {error}", "timings": timings or {}}
+
+
+def _solve_text_chunk(chunk):
+    """
+    Worker task: solves a list of (source, board, error) puzzles from a file.
+    The 9x9 boards of the chunk go through the vectorized batch solver, so each
+    of their records' solve time is its share of the chunk's time; boards of
+    other sizes are solved one at a time.
+    """
+    import numpy as np
+    from batch_solver import solve_boards
+
+    parsed = [(source, board) for source, board, error in chunk if board is not None and board.shape == (9, 9)]
+    records = [{"source": source, "status": "error", "error": f"ValueError: {error}", "timings": {}}
+               for source, board, error in chunk if board is None]
+    records.extend(solve_record(source, board, {}) for source, board, error in chunk
+                   if board is not None and board.shape != (9, 9))
+    if parsed:
+        boards = np.stack([board for _, board in parsed])
+        started = time.perf_counter()
+        solutions, solved = solve_boards(boards)
+        share = (time.perf_counter() - started) / len(parsed)
+        for (source, board), solution, ok in zip(parsed, solutions, solved):
+            records.append({
+                "source": source,
+                "status": "solved" if ok else "unsolvable",
+                "grid": board_to_string(board),
+                "solution": board_to_string(solution) if ok else None,
+                "timings": {"solve": share},
+            })
+    if _render_dir is not None:
+        _render_records(records)
+    return records
+
+
+def _init_render(render_dir):
+    """Pool initializer for puzzle files: sets where solved puzzles are rendered."""
+    global _render_dir
+    _render_dir = render_dir
+
+
+def _render_path(source):
+    """A file name in the render directory for a puzzle source such as hard/3.jpg or puzzles.txt:12."""
+    if source.lower().endswith(IMAGE_EXTENSIONS):
+        source = os.path.splitext(source)[0]
+    return os.path.join(_render_dir, re.sub(r"[^\w.-]+", "_", source).strip("_") + ".png")
+
+
+def _render_records(records):
+    """Renders every solved record of a chunk onto blank grids in one batch and notes the image paths."""
+    from puzzle_io import parse_puzzle_string
+    from solution_renderer import render_boards, write_images
+
+    solved = [record for record in records if record["status"] == "solved"]
+    if not solved:
+        return
+    started = time.perf_counter()
+    images = render_boards([parse_puzzle_string(record["grid"]) for record in solved],
+                           [parse_puzzle_string(record["solution"]) for record in solved])
+    paths = [_render_path(record["source"]) for record in solved]
+    write_images(images, paths)
+    share = (time.perf_counter() - started) / len(solved)
+    for record, path in zip(solved, paths):
+        record["image"] = path
+        record["timings"]["render"] = share
+
+
+def _init_image_worker(model_path, timeout=None, render_dir=None):
+    """Pool initializer: loads the classifier once per worker process."""
+    global _worker_model, _worker_timeout, _render_dir
+    from utils_MNIST_Classify import load_model
+
+    _worker_timeout = timeout
+    _render_dir = render_dir
+
+    if not model_path.endswith(".npz"):
+        os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+        import tensorflow as tf
+
+        # One process per core already saturates the machine; avoid oversubscribing it with TF threads.
+        tf.config.threading.set_intra_op_parallelism_threads(1)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    _worker_model = load_model(model_path)
+
+
+def _solve_image(path):
+    """Worker task: extracts, recognizes and solves one photo."""
+    from sudoku_pipeline import process_image
+
+    started = time.perf_counter()
+    try:
+        image = path
+        if _render_dir is not None:  # Keep the decoded photo to draw the solution onto.
+            import cv2
+
+            image = cv2.imread(path)
+            if image is None:
+                raise ValueError(f"Could not read image {path}.")
+        extraction = process_image(image, _worker_model)
+    except Exception as error:
+        return [error_record(path, error, {"recognize": time.perf_counter() - started})]
+    timings = {"recognize": time.perf_counter() - started}
+    record = solve_record(path, extraction["board"], timings, _worker_timeout)
+    if record["status"] == "solved":
+        record["solution_count"] = _solution_count(extraction["board"])
+    # A misread grid usually has no solution or several; either way retry it.
+    if record["status"] == "unsolvable" or record.get("solution_count", 1) != 1:
+        record = _recover_record(path, extraction, record)
+    if _render_dir is not None and record["status"] == "solved":
+        from puzzle_io import parse_puzzle_string
+        from solution_renderer import render_on_photos, write_images
+
+        started = time.perf_counter()
+        board, solution = parse_puzzle_string(record["grid"]), parse_puzzle_string(record["solution"])
+        record["image"] = _render_path(path)
+        write_images(render_on_photos([board], [solution], [image], [extraction["homography"]]), [record["image"]])
+        record["timings"]["render"] = time.perf_counter() - started
+    return [record]
+
+
+def _solution_count(board):
+    """0, 1 or 2 (meaning several) solutions of a recognized board, or None if counting ran out of time."""
+    from solve_sudoku import count_solutions
+    from solver_limits import SearchBudget, SearchInterrupted
+
+    try:
+        return count_solutions(board, budget=SearchBudget(timeout=_worker_timeout or 5.0))
+    except SearchInterrupted:
+        return None
+
+
+def _recover_record(path, extraction, record):
+    """
+    Retries a photo whose grid does not have exactly one solution with the most
+    probable reading that does (see confidence_solver). The record notes the
+    corrected cells; the original record is returned when no reading works.
+    """
+    from confidence_solver import recover_grid
+
+    started = time.perf_counter()
+    recovered = recover_grid(extraction["candidates"], extraction["candidate_probabilities"],
+                             timeout=_worker_timeout or 5.0)
+    timings = {**record["timings"], "recover": time.perf_counter() - started}
+    if recovered is None:
+        return {**record, "timings": timings}
+    retried = solve_record(path, recovered.board, timings, _worker_timeout)
+    retried["solution_count"] = 1
+    retried["recognized"] = record["grid"]
+    retried["corrections"] = [[int(v) for v in correction] for correction in recovered.corrections]
+    return retried
+
+
+def iter_puzzle_file(path):
+    """Yields (source, board, error) for every record of a text or packed puzzle file."""
+    for record in read_puzzles(path):
+        location = record.line if record.line is not None else record.index
+        yield f"{path}:{location}", record.board, record.error
+
+
+def iter_image_paths(directory):
+    """Yields the image files of a directory in natural order (1.jpg, 2.jpg, ..., 10.jpg)."""
+    names = [name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS)]
+    names.sort(key=lambda name: (len(name), name))
+    for name in names:
+        yield os.path.join(directory, name)
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def solve_puzzle_file(path, workers=None, chunksize=256, render_dir=None):
+    """Solves every puzzle of a text or packed file across a process pool, yielding result records as they finish."""
+    with Pool(workers, initializer=_init_render, initargs=(render_dir,)) as pool:
+        for records in pool.imap_unordered(_solve_text_chunk, _chunks(iter_puzzle_file(path), chunksize)):
+            yield from records
+
+
+def solve_image_paths(paths, workers=None, model_path=MODEL_PATH, timeout=None, render_dir=None):
+    """Extracts, recognizes and solves photos across a process pool, yielding result records as they finish."""
+    with Pool(workers, initializer=_init_image_worker, initargs=(model_path, timeout, render_dir)) as pool:
+        for records in pool.imap_unordered(_solve_image, paths):
+            yield from records
+
+
+def bulk_solve(source, workers=None, chunksize=256, model_path=MODEL_PATH, timeout=None, render_dir=None):
+    """
+    Solves a directory of images or a text/packed puzzle file, yielding one result record per puzzle.
+    timeout limits the search per photo; puzzle files go through the batch solver and ignore it.
+    Solved puzzles are rendered into render_dir when it is given.
+    """
+    if os.path.isdir(source):
+        return solve_image_paths(list(iter_image_paths(source)), workers, model_path, timeout, render_dir)
+    return solve_puzzle_file(source, workers, chunksize, render_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve many Sudoku puzzles without interaction.")
+    parser.add_argument("sources", nargs="+", help="Image directories (e.g. hard/), text files with one puzzle per line, or packed .sdkp files.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+    parser.add_argument("--chunksize", type=int, default=256, help="Puzzles from a file handed to a worker at a time.")
+    parser.add_argument("--model", default=MODEL_PATH, help="Exported .npz classifier, or a .keras model to run with TensorFlow.")
+    parser.add_argument("--output", help="Write JSON lines here instead of standard output.")
+    parser.add_argument("--timeout", type=float, help="Seconds each photo may spend searching before it is reported as budget_exceeded.")
+    parser.add_argument("--render", metavar="DIR", help="Also draw every solved puzzle as a PNG in this directory.")
+    args = parser.parse_args(argv)
+
+    if args.render:
+        os.makedirs(args.render, exist_ok=True)
+    output = open(args.output, "w") if args.output else sys.stdout
+    counts = {}
+    started = time.perf_counter()
+    try:
+        for source in args.sources:
+            for record in bulk_solve(source, args.workers, args.chunksize, args.model, args.timeout, args.render):
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+    finally:
+        if args.output:
+            output.close()
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"{total} puzzles in {elapsed:.2f} seconds ({total / elapsed:.1f}/s): {summary}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
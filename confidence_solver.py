@@ -0,0 +1,155 @@
+"""
+Joint recognition and solving.
+
+The pipeline keeps the top-k labels of every cell with their probabilities
+(sudoku_pipeline.process_image returns them as "candidates" and
+"candidate_probabilities"). Instead of trusting the most probable label of
+every cell, recover_grid treats each cell with ink as a soft constraint: it
+may hold any of its candidate digits, or be dropped and left for the solver
+(label 0, "not a digit", or EMPTY_FLOOR when the classifier did not rank it).
+A branch-and-bound search over those choices finds the reading with the
+highest total log-probability whose givens do not clash and have exactly one
+solution. One misread digit therefore costs some extra search instead of a
+manual rerun; a digit whose true label is not even in the top k is simply
+dropped, which still gives the right solution as long as the rest of the
+puzzle pins it down:
+
+    extraction = process_image(image, model)
+    recovered = recover_grid(extraction["candidates"], extraction["candidate_probabilities"])
+    if recovered is not None:
+        board, solution = recovered.board, recovered.solution
+"""
+import math
+from dataclasses import dataclass, field
+from math import isqrt
+
+import numpy as np
+
+import tracing
+from bitmask_solver import _layout, _propagate, count_cells, solve_cells
+from solver_limits import SearchBudget, SearchInterrupted
+
+# Probability given to "this ink is not a digit" when the classifier did not
+# put label 0 among the top k, so a stray mark can always be dropped.
+EMPTY_FLOOR = 0.01
+
+# Search nodes one uniqueness check may take; a reading that needs more is
+# treated as ambiguous. Real 9x9 puzzles need a few dozen at most.
+UNIQUENESS_MAX_NODES = 2000
+
+
+@dataclass
+class RecoveredGrid:
+    board: np.ndarray           # The chosen reading of the photo (0 for empty).
+    solution: np.ndarray        # Its unique solution.
+    log_probability: float      # Sum of the log-probabilities of the chosen labels.
+    corrections: list = field(default_factory=list)  # (row, col, most probable label, chosen label) per changed cell.
+    readings_checked: int = 0   # Clash-free readings whose solutions were counted.
+
+
+def cell_options(labels, probabilities, size, empty_floor=EMPTY_FLOOR):
+    """
+    The possible values of every cell as a list of (value, log-probability)
+    pairs, most probable first. Labels outside 1..size count as empty (0).
+    """
+    options = []
+    for cell_labels, cell_probabilities in zip(labels.reshape(size * size, -1), probabilities.reshape(size * size, -1)):
+        best = {}
+        for label, probability in zip(cell_labels.tolist(), cell_probabilities.tolist()):
+            value = label if 1 <= label <= size else 0
+            best[value] = max(best.get(value, 0.0), probability)
+        if 0 not in best:
+            best[0] = empty_floor
+        options.append(sorted(((value, math.log(p)) for value, p in best.items() if p > 0),
+                              key=lambda option: -option[1]))
+    return options
+
+
+def recover_grid(labels, probabilities, timeout=5.0, empty_floor=EMPTY_FLOOR):
+    """
+    Finds the most probable reading of the cells that has exactly one solution.
+
+    Parameters:
+    - labels, probabilities: The (size, size, k) top-k labels and probabilities of every cell.
+    - timeout: Seconds to search before settling for the best reading found so far.
+    - empty_floor: Probability of an ink cell being empty when label 0 is not among its top k.
+
+    Returns a RecoveredGrid, or None if no reading has a unique solution (or
+    none was found in time).
+    """
+    labels, probabilities = np.asarray(labels), np.asarray(probabilities)
+    size = labels.shape[0]
+    box = isqrt(size)
+    if box * box != size or labels.shape[:2] != (size, size) or probabilities.shape != labels.shape:
+        raise ValueError(f"Expected (size, size, k) labels and probabilities, got {labels.shape} and {probabilities.shape}")
+
+    options = cell_options(labels, probabilities, size, empty_floor)
+    # Cells without ink stay empty. The others are decided most confident first,
+    # so clashes show up while the uncertain cells still have room to give.
+    soft = sorted((i for i, cell in enumerate(options) if cell[0][0] or len(cell) > 1), key=lambda i: -options[i][0][1])
+    fixed = sum(options[i][0][1] for i in range(len(options)) if i not in set(soft))
+    layout = _layout(box)
+    _, _, row_of, col_of, box_of, _ = layout
+
+    grid = [0] * (size * size)
+    rows, cols, boxes = [0] * size, [0] * size, [0] * size
+    budget = SearchBudget(timeout=timeout)
+    best = [None, -math.inf, 0]  # Best grid, its log-probability, unique-solution checks made.
+
+    def allowed(i):
+        used = rows[row_of[i]] | cols[col_of[i]] | boxes[box_of[i]]
+        return [(value, log_p) for value, log_p in options[i] if not value or not used & (1 << (value - 1))]
+
+    def search(depth, score):
+        budget.visit(depth)
+        if depth == len(soft):
+            best[2] += 1
+            try:
+                unique = count_cells(grid, box, budget=SearchBudget(max_nodes=UNIQUENESS_MAX_NODES)) == 1
+            except SearchInterrupted:
+                unique = False
+            if unique:
+                best[0], best[1] = list(grid), score
+            return
+        # Upper bound: every remaining cell gets its most probable value that still fits.
+        if score + sum(allowed(i)[0][1] for i in soft[depth:]) <= best[1]:
+            return
+        i = soft[depth]
+        r, c, b = row_of[i], col_of[i], box_of[i]
+        for value, log_p in allowed(i):
+            if score + log_p + sum(allowed(j)[0][1] for j in soft[depth + 1:]) <= best[1]:
+                continue
+            if value:
+                bit = 1 << (value - 1)
+                grid[i] = value
+                rows[r] |= bit
+                cols[c] |= bit
+                boxes[b] |= bit
+                # More givens never bring a solution back, so a reading that singles
+                # already prove unsolvable is not worth completing.
+                if _propagate(list(grid), list(rows), list(cols), list(boxes), layout) is False:
+                    grid[i] = 0
+                    rows[r] ^= bit
+                    cols[c] ^= bit
+                    boxes[b] ^= bit
+                    continue
+            search(depth + 1, score + log_p)
+            if value:
+                grid[i] = 0
+                rows[r] ^= bit
+                cols[c] ^= bit
+                boxes[b] ^= bit
+
+    try:
+        with tracing.span("recover", cells=len(soft)):
+            search(0, fixed)
+    except SearchInterrupted:
+        pass  # Out of time: keep the best reading found so far.
+    tracing.count("recover.readings_checked", best[2])
+    if best[0] is None:
+        return None
+
+    board = np.array(best[0]).reshape(size, size)
+    corrections = [(i // size, i % size, options[i][0][0], best[0][i]) for i in sorted(soft) if best[0][i] != options[i][0][0]]
+    solution = np.array(solve_cells(best[0], box)).reshape(size, size)
+    return RecoveredGrid(board, solution, best[1], corrections, best[2])
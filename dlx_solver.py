@@ -0,0 +1,214 @@
+"""
+Exact-cover Sudoku solver (Knuth's Algorithm X with Dancing Links).
+
+A board becomes an exact-cover matrix with one column per constraint (every
+cell filled, every digit once per row, column and box) and one row per
+possible placement. Unlike the other engines this one can keep going after the
+first solution, which makes it the tool for counting solutions and checking
+that a recognized grid has exactly one.
+"""
+from math import isqrt
+
+import numpy as np
+
+import tracing
+
+
+def _build_links(board):
+    """
+    Builds the dancing-links structure for a board with its givens already
+    selected. Returns (links, placements) or None if two givens clash.
+    """
+    size = len(board)
+    box = isqrt(size)
+    if box * box != size or board.shape != (size, size):
+        raise ValueError(f"Board must be square with a square side length, got shape {board.shape}")
+    area = size * size
+    columns = 4 * area
+
+    # Node 0 is the root; nodes 1..columns are the column headers.
+    left = list(range(-1, columns))
+    right = list(range(1, columns + 2))
+    left[0], right[columns] = columns, 0
+    up = list(range(columns + 1))
+    down = list(range(columns + 1))
+    column_of = list(range(columns + 1))
+    sizes = [0] * (columns + 1)
+    placement_of = [None] * (columns + 1)  # (row, col, digit) for each matrix node.
+
+    rows_used = [set() for _ in range(size)]
+    cols_used = [set() for _ in range(size)]
+    boxes_used = [set() for _ in range(size)]
+    for (r, c), digit in np.ndenumerate(board):
+        if not digit:
+            continue
+        digit = int(digit)
+        if not 1 <= digit <= size:
+            raise ValueError(f"Cell value {digit} is out of range for a {size}x{size} board")
+        b = (r // box) * box + c // box
+        if digit in rows_used[r] or digit in cols_used[c] or digit in boxes_used[b]:
+            return None
+        rows_used[r].add(digit)
+        cols_used[c].add(digit)
+        boxes_used[b].add(digit)
+
+    # Only placements compatible with the givens become matrix rows; a given
+    # cell gets just its own digit, which covers its columns from the start.
+    for r in range(size):
+        for c in range(size):
+            b = (r // box) * box + c // box
+            given = int(board[r, c])
+            digits = [given] if given else [d for d in range(1, size + 1)
+                                            if d not in rows_used[r] and d not in cols_used[c] and d not in boxes_used[b]]
+            for digit in digits:
+                d = digit - 1
+                first = len(left)
+                targets = (1 + r * size + c, 1 + area + r * size + d, 1 + 2 * area + c * size + d, 1 + 3 * area + b * size + d)
+                for k, column in enumerate(targets):
+                    node = first + k
+                    left.append(node - 1 if k else first + 3)
+                    right.append(node + 1 if k < 3 else first)
+                    up.append(up[column])
+                    down.append(column)
+                    down[up[column]] = node
+                    up[column] = node
+                    column_of.append(column)
+                    placement_of.append((r, c, digit))
+                    sizes[column] += 1
+
+    return (left, right, up, down, column_of, sizes), placement_of
+
+
+def _cover(links, column):
+    left, right, up, down, column_of, sizes = links
+    right[left[column]] = right[column]
+    left[right[column]] = left[column]
+    i = down[column]
+    while i != column:
+        j = right[i]
+        while j != i:
+            down[up[j]] = down[j]
+            up[down[j]] = up[j]
+            sizes[column_of[j]] -= 1
+            j = right[j]
+        i = down[i]
+
+
+def _uncover(links, column):
+    left, right, up, down, column_of, sizes = links
+    i = up[column]
+    while i != column:
+        j = left[i]
+        while j != i:
+            sizes[column_of[j]] += 1
+            down[up[j]] = j
+            up[down[j]] = j
+            j = left[j]
+        i = up[i]
+    right[left[column]] = column
+    left[right[column]] = column
+
+
+def iter_solutions(board, stats=None, budget=None):
+    """
+    Lazily yields every solution of the board as a new NumPy array; the input
+    board is not modified. Stop iterating whenever enough solutions were seen.
+    Search counts are added to stats (a solver_stats.SolveStats) when it is given.
+    A solver_limits.SearchBudget is charged one visit per branching choice and
+    may stop the search by raising SearchInterrupted.
+    """
+    built = _build_links(board)
+    if built is None:
+        return
+    links, placement_of = built
+    left, right, up, down, column_of, sizes = links
+
+    # Givens own the only row in their cell's column; select them up front.
+    chosen = []
+    for column in range(1, len(board) ** 2 + 1):
+        if board.flat[column - 1]:
+            row = down[column]
+            chosen.append(row)
+            _cover(links, column)
+            j = right[row]
+            while j != row:
+                _cover(links, column_of[j])
+                j = right[j]
+
+    givens = len(chosen)
+    if stats is not None:
+        stats.techniques.add("exact cover")
+        stats.nodes += 1
+    tracing.count("dlx.searches")
+
+    def search():
+        if right[0] == 0:
+            solution = board.copy()
+            for node in chosen:
+                r, c, digit = placement_of[node]
+                solution[r, c] = digit
+            yield solution
+            return
+
+        # Branch on the column with the fewest remaining rows.
+        column, best = 0, None
+        j = right[0]
+        while j != 0:
+            if best is None or sizes[j] < best:
+                column, best = j, sizes[j]
+                if best <= 1:
+                    break
+            j = right[j]
+        if best == 0:
+            if stats is not None:
+                stats.backtracks += 1
+            return
+
+        _cover(links, column)
+        row = down[column]
+        while row != column:
+            chosen.append(row)
+            if best > 1:  # Forced placements are not guesses.
+                if budget is not None:
+                    budget.visit(len(chosen) - givens)
+                if stats is not None:
+                    stats.nodes += 1
+                    stats.max_depth = max(stats.max_depth, len(chosen) - givens)
+            j = right[row]
+            while j != row:
+                _cover(links, column_of[j])
+                j = right[j]
+            yield from search()
+            j = left[row]
+            while j != row:
+                _uncover(links, column_of[j])
+                j = left[j]
+            chosen.pop()
+            row = down[row]
+        _uncover(links, column)
+
+    with tracing.span("dlx.search", size=len(board)):
+        yield from search()
+
+
+def count_solutions(board, limit=2, budget=None):
+    """Counts the board's solutions, stopping as soon as limit of them were found."""
+    count = 0
+    for _ in iter_solutions(board, budget=budget):
+        count += 1
+        if count >= limit:
+            break
+    return count
+
+
+def has_unique_solution(board):
+    """True if the board has exactly one solution."""
+    return count_solutions(board, limit=2) == 1
+
+
+def solve(board, stats=None, budget=None):
+    """Solves the board in place with the first solution found. Returns False if there is none."""
+    for solution in iter_solutions(board, stats, budget):
+        board[:] = solution
+        return True
+    return False
@@ -0,0 +1,184 @@
+"""
+TensorFlow-free inference for the digit classifier.
+
+The CNN in trained_model_classification_MNIST.keras is small enough that a
+plain NumPy forward pass classifies a whole puzzle in a few milliseconds, so
+the multi-second TensorFlow import is not needed at run time. Export the
+weights once:
+
+    python numpy_classifier.py                          # writes trained_model_classification_MNIST.npz
+    python numpy_classifier.py --int8                   # int8 weights with per-channel scales
+
+and load the .npz with utils_MNIST_Classify.load_model. Exporting reads the
+.keras archive with h5py only; TensorFlow is not imported at all.
+"""
+import argparse
+import io
+import json
+import zipfile
+
+import numpy as np
+
+KERAS_MODEL_PATH = "trained_model_classification_MNIST.keras"
+NUMPY_MODEL_PATH = "trained_model_classification_MNIST.npz"
+SUPPORTED_ACTIVATIONS = ("linear", "relu", "softmax")
+
+# Keras 3 stores a layer's weights under the snake_case class name plus a per-class counter.
+_WEIGHT_GROUPS = {"Conv2D": "conv2d", "Dense": "dense"}
+
+
+def _layer_spec(layer):
+    """Reduces a Keras layer config to what the forward pass needs; rejects anything it cannot run."""
+    kind, config = layer["class_name"], layer["config"]
+    if kind == "Conv2D":
+        if config["padding"] != "valid" or tuple(config["strides"]) != (1, 1) or tuple(config.get("dilation_rate", (1, 1))) != (1, 1):
+            raise ValueError(f"Only stride-1 'valid' convolutions are supported, got {config['name']}")
+    elif kind == "MaxPooling2D":
+        if config["padding"] != "valid" or tuple(config["strides"]) != tuple(config["pool_size"]):
+            raise ValueError(f"Only non-overlapping 'valid' pooling is supported, got {config['name']}")
+        return {"type": kind, "pool_size": list(config["pool_size"])}
+    elif kind in ("Flatten", "Dropout"):
+        return {"type": kind}
+    elif kind != "Dense":
+        raise ValueError(f"Unsupported layer type {kind}")
+    if config.get("activation", "linear") not in SUPPORTED_ACTIVATIONS:
+        raise ValueError(f"Unsupported activation {config['activation']} in {config['name']}")
+    if config.get("data_format", "channels_last") != "channels_last":
+        raise ValueError(f"Only channels_last layers are supported, got {config['name']}")
+    return {"type": kind, "activation": config.get("activation", "linear")}
+
+
+def quantize_int8(kernel):
+    """Symmetric per-output-channel int8 quantization. Returns (int8 kernel, float32 scales)."""
+    reduce_axes = tuple(range(kernel.ndim - 1))
+    scales = np.abs(kernel).max(axis=reduce_axes) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(kernel / scales).astype(np.int8), scales.astype(np.float32)
+
+
+def export_keras_weights(keras_path=KERAS_MODEL_PATH, output_path=NUMPY_MODEL_PATH, int8=False):
+    """
+    Writes the layer layout and weights of a Sequential .keras model to a compressed .npz file.
+    With int8, kernels are stored as int8 with per-output-channel scales: about a quarter of the
+    size, but probabilities move by up to a few percent, so a handful of borderline cells can flip.
+    """
+    import h5py
+
+    with zipfile.ZipFile(keras_path) as archive:
+        config = json.loads(archive.read("config.json"))
+        weights_file = io.BytesIO(archive.read("model.weights.h5"))
+    if config["class_name"] != "Sequential":
+        raise ValueError(f"Only Sequential models can be exported, got {config['class_name']}")
+
+    specs, arrays, counters = [], {}, {}
+    with h5py.File(weights_file, "r") as weights:
+        for layer in config["config"]["layers"]:
+            if layer["class_name"] == "InputLayer":
+                continue
+            spec = _layer_spec(layer)
+            group = _WEIGHT_GROUPS.get(layer["class_name"])
+            if group is not None:
+                count = counters.get(group, 0)
+                counters[group] = count + 1
+                stored = weights[f"layers/{group}{f'_{count}' if count else ''}/vars"]
+                kernel, bias = np.asarray(stored["0"], dtype=np.float32), np.asarray(stored["1"], dtype=np.float32)
+                prefix = f"layer{len(specs)}"
+                if int8:
+                    arrays[prefix + "_kernel"], arrays[prefix + "_scale"] = quantize_int8(kernel)
+                else:
+                    arrays[prefix + "_kernel"] = kernel
+                arrays[prefix + "_bias"] = bias
+            specs.append(spec)
+
+    np.savez_compressed(output_path, layers=np.array(json.dumps(specs)), **arrays)
+    return output_path
+
+
+def _conv2d(x, kernel, bias):
+    """Stride-1 'valid' convolution of (N, H, W, C) inputs as a single matrix product over unfolded patches."""
+    kh, kw, channels, filters = kernel.shape
+    n, out_h, out_w = x.shape[0], x.shape[1] - kh + 1, x.shape[2] - kw + 1
+    # Unfold with the channels innermost so each tap copies contiguous blocks and the
+    # columns line up with the (kh, kw, C, F) kernel without transposing it.
+    columns = np.concatenate([x[:, i:i + out_h, j:j + out_w, :] for i in range(kh) for j in range(kw)], axis=-1)
+    out = columns.reshape(-1, kh * kw * channels) @ kernel.reshape(kh * kw * channels, filters)
+    out += bias
+    return out.reshape(n, out_h, out_w, filters)
+
+
+def _max_pool(x, pool_size):
+    """Non-overlapping 'valid' max pooling as an elementwise maximum over the strided window offsets."""
+    ph, pw = pool_size
+    h, w = x.shape[1] // ph * ph, x.shape[2] // pw * pw
+    out = x[:, 0:h:ph, 0:w:pw, :].copy()
+    for i in range(ph):
+        for j in range(pw):
+            if i or j:
+                np.maximum(out, x[:, i:h:ph, j:w:pw, :], out=out)
+    return out
+
+
+def _activate(x, activation):
+    if activation == "relu":
+        return np.maximum(x, 0, out=x)
+    if activation == "softmax":
+        x = np.exp(x - x.max(axis=-1, keepdims=True))
+        return x / x.sum(axis=-1, keepdims=True)
+    return x
+
+
+class NumpyClassifier:
+    """
+    Drop-in replacement for the Keras model in the recognition code: it offers
+    predict_on_batch and predict and returns the same (N, 10) probabilities.
+    """
+
+    def __init__(self, path=NUMPY_MODEL_PATH):
+        with np.load(path) as data:
+            self.layers = json.loads(str(data["layers"]))
+            self.weights = []
+            for index, spec in enumerate(self.layers):
+                prefix = f"layer{index}"
+                if prefix + "_kernel" not in data:
+                    self.weights.append(None)
+                    continue
+                kernel = data[prefix + "_kernel"].astype(np.float32)
+                if prefix + "_scale" in data:
+                    kernel *= data[prefix + "_scale"]  # Dequantize int8 weights once at load time.
+                self.weights.append((kernel, data[prefix + "_bias"].astype(np.float32)))
+
+    def predict_on_batch(self, batch):
+        x = np.asarray(batch, dtype=np.float32)
+        if x.ndim == 3:
+            x = x[..., None]
+        for spec, weights in zip(self.layers, self.weights):
+            kind = spec["type"]
+            if kind == "Conv2D":
+                x = _activate(_conv2d(x, *weights), spec["activation"])
+            elif kind == "MaxPooling2D":
+                x = _max_pool(x, spec["pool_size"])
+            elif kind == "Flatten":
+                x = x.reshape(len(x), -1)
+            elif kind == "Dense":
+                x = _activate(x @ weights[0] + weights[1], spec["activation"])
+        return x
+
+    def predict(self, batch, batch_size=None, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        if batch_size is None or len(batch) <= batch_size:
+            return self.predict_on_batch(batch)
+        return np.concatenate([self.predict_on_batch(batch[start:start + batch_size])
+                               for start in range(0, len(batch), batch_size)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the Keras digit classifier for TensorFlow-free inference.")
+    parser.add_argument("model", nargs="?", default=KERAS_MODEL_PATH, help="Sequential .keras model to export.")
+    parser.add_argument("--output", default=NUMPY_MODEL_PATH)
+    parser.add_argument("--int8", action="store_true", help="Store int8 kernels with per-channel scales.")
+    args = parser.parse_args(argv)
+    print(f"Exported {args.model} to {export_keras_weights(args.model, args.output, args.int8)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Puzzle generator with difficulty targeting.
+
+    python puzzle_generator.py --count 10000 --output puzzles.txt
+    python puzzle_generator.py --count 500 --difficulty hard --symmetry rotational --workers 8
+    python puzzle_generator.py --count 100000 --output puzzles.sdkp     # packed format (see puzzle_io)
+
+Every puzzle starts from a random full grid (random boxes on the diagonal,
+completed by the bitmask engine). Clues are then removed in random order,
+a whole symmetry orbit at a time, keeping a removal only while the puzzle
+still has exactly one solution and is no harder than the target band. A
+puzzle that ends up in the target band is written out, the others are
+dropped. Difficulty is solve_sudoku.grade_difficulty of a bitmask solve, so
+generated puzzles are graded the same way solved ones are.
+
+Workers each generate a batch of puzzles per task from their own seed, and
+results are written as soon as a batch comes back, so the output is streamed
+and the same --seed always yields the same puzzles (in completion order).
+Text output has one puzzle per line followed by its difficulty and clue count.
+"""
+import argparse
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+from bitmask_solver import count_cells, solve_cells
+from solve_sudoku import grade_difficulty
+from solver_limits import SearchBudget, SearchInterrupted
+from solver_stats import SolveStats
+
+DIFFICULTIES = ("Easy", "Moderate", "Hard")
+SYMMETRIES = ("none", "rotational", "diagonal", "mirror", "dihedral")
+
+# Search nodes a uniqueness check may take before the clue is simply kept.
+# 9x9 checks rarely need more than ten; on 16x16 boards proving that a nearly
+# minimal puzzle is unique can take minutes, which is not worth one clue.
+UNIQUENESS_MAX_NODES = 100
+
+# generate_puzzle calls in a row that may come back empty before a batch gives up
+# on its band: some bands cannot be reached at all, e.g. a 4x4 puzzle never needs
+# a guess, so none is ever graded Hard.
+MAX_FAILED_ROUNDS = 20
+
+
+def random_solution(box, rng):
+    """
+    A random full grid as a flat list. The boxes on the diagonal share no row or
+    column, so they are filled with random digits and the engine completes the
+    rest (redrawing in the rare case that cannot be done).
+    """
+    size = box * box
+    while True:
+        grid = [0] * (size * size)
+        for b in range(box):
+            digits = rng.sample(range(1, size + 1), size)
+            for k, digit in enumerate(digits):
+                r, c = b * box + k // box, b * box + k % box
+                grid[r * size + c] = digit
+        solution = solve_cells(grid, box)
+        if solution is not None:
+            return solution
+
+
+def symmetry_orbits(size, symmetry):
+    """Groups the cell indices into the sets that a symmetric clue pattern keeps or removes together."""
+    if symmetry not in SYMMETRIES:
+        raise ValueError(f"Unknown symmetry {symmetry!r}; expected one of {', '.join(SYMMETRIES)}.")
+    last = size - 1
+    maps = {
+        "none": [],
+        "rotational": [lambda r, c: (last - r, last - c)],
+        "diagonal": [lambda r, c: (c, r)],
+        "mirror": [lambda r, c: (r, last - c)],
+        "dihedral": [lambda r, c: (last - r, last - c), lambda r, c: (c, r), lambda r, c: (r, last - c),
+                     lambda r, c: (c, last - r), lambda r, c: (last - c, r), lambda r, c: (last - r, c),
+                     lambda r, c: (last - c, last - r)],
+    }[symmetry]
+    orbits, seen = [], set()
+    for r in range(size):
+        for c in range(size):
+            if (r, c) in seen:
+                continue
+            orbit = {(r, c)} | {mapping(r, c) for mapping in maps}
+            seen |= orbit
+            orbits.append(sorted(row * size + col for row, col in orbit))
+    return orbits
+
+
+def is_unique(grid, box):
+    """True if the flat grid has exactly one solution; False if not, or if proving it takes too long."""
+    try:
+        return count_cells(grid, box, budget=SearchBudget(max_nodes=UNIQUENESS_MAX_NODES)) == 1
+    except SearchInterrupted:
+        return False
+
+
+def grade_cells(grid, box):
+    """The difficulty band of a puzzle given as a flat list of cells."""
+    stats = SolveStats(engine="bitmask")
+    stats.solved = solve_cells(grid, box, stats) is not None
+    return grade_difficulty(stats)
+
+
+def generate_puzzle(rng, difficulty=None, symmetry="none", box=3, max_attempts=50):
+    """
+    Generates one puzzle with a unique solution.
+
+    Parameters:
+    - rng: random.Random to draw from.
+    - difficulty: Target band ("Easy", "Moderate" or "Hard"); None accepts any.
+    - symmetry: Clue pattern, one of SYMMETRIES.
+    - box: Box side length (3 for 9x9 boards).
+    - max_attempts: Full grids tried before giving up.
+
+    Returns (puzzle, solution, difficulty) with the boards as flat lists, or
+    None if no puzzle in the band came out of max_attempts grids.
+    """
+    if difficulty is not None and difficulty not in DIFFICULTIES:
+        raise ValueError(f"Unknown difficulty {difficulty!r}; expected one of {', '.join(DIFFICULTIES)}.")
+    target = DIFFICULTIES.index(difficulty) if difficulty else len(DIFFICULTIES) - 1
+    orbits = symmetry_orbits(box * box, symmetry)
+
+    for _ in range(max_attempts):
+        solution = random_solution(box, rng)
+        puzzle = list(solution)
+        for orbit in rng.sample(orbits, len(orbits)):
+            for idx in orbit:
+                puzzle[idx] = 0
+            too_hard = target < len(DIFFICULTIES) - 1 and DIFFICULTIES.index(grade_cells(puzzle, box)) > target
+            if too_hard or not is_unique(puzzle, box):
+                for idx in orbit:
+                    puzzle[idx] = solution[idx]
+        grade = grade_cells(puzzle, box)
+        if difficulty is None or grade == difficulty:
+            return puzzle, solution, grade
+    return None
+
+
+def _generate_batch(task):
+    """
+    Worker task: generates count puzzles from one seed. Returns count and the
+    (puzzle, solution, difficulty) list, which is short if MAX_FAILED_ROUNDS
+    generate_puzzle calls in a row found nothing in the band.
+    """
+    seed, count, difficulty, symmetry, box = task
+    rng = random.Random(seed)
+    puzzles = []
+    failed = 0
+    while len(puzzles) < count and failed < MAX_FAILED_ROUNDS:
+        puzzle = generate_puzzle(rng, difficulty, symmetry, box)
+        if puzzle is None:
+            failed += 1
+        else:
+            puzzles.append(puzzle)
+            failed = 0
+    return count, puzzles
+
+
+def generate_puzzles(count, difficulty=None, symmetry="none", box=3, workers=None, seed=None, batch_size=16):
+    """
+    Yields count (puzzle, solution, difficulty) tuples, generated in parallel
+    on a process pool (workers=1 generates in this process). Batches are
+    yielded as soon as a worker finishes them. Fewer are yielded if the band
+    turns out to be out of reach: generation stops after the first short batch.
+    """
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    tasks = [(seed * 1_000_003 + index, min(batch_size, count - start), difficulty, symmetry, box)
+             for index, start in enumerate(range(0, count, batch_size))]
+    if workers == 1:
+        for requested, batch in map(_generate_batch, tasks):
+            yield from batch
+            if len(batch) < requested:
+                return
+        return
+    with Pool(workers) as pool:
+        for requested, batch in pool.imap_unordered(_generate_batch, tasks):
+            yield from batch
+            if len(batch) < requested:
+                return
+
+
+def main(argv=None):
+    from puzzle_io import CELL_SYMBOLS, PACKED_EXTENSION, write_packed_puzzles
+
+    parser = argparse.ArgumentParser(description="Generate Sudoku puzzles with a unique solution.")
+    parser.add_argument("--count", type=int, default=100, help="Number of puzzles to generate.")
+    parser.add_argument("--difficulty", type=str.capitalize, choices=DIFFICULTIES, help="Target difficulty band (default: any).")
+    parser.add_argument("--symmetry", choices=SYMMETRIES, default="none", help="Symmetry of the clue pattern.")
+    parser.add_argument("--size", type=int, default=9, choices=(4, 9, 16), help="Board side length.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible output.")
+    parser.add_argument("--batch-size", type=int, default=16, help="Puzzles per worker task.")
+    parser.add_argument("--output", help="Output file, .sdkp for the packed format (default: stdout).")
+    args = parser.parse_args(argv)
+
+    box = {4: 2, 9: 3, 16: 4}[args.size]
+    puzzles = generate_puzzles(args.count, args.difficulty, args.symmetry, box, args.workers, args.seed, args.batch_size)
+    started = time.perf_counter()
+    if args.output and args.output.endswith(PACKED_EXTENSION):
+        import numpy as np
+
+        boards = (np.array(puzzle).reshape(args.size, args.size) for puzzle, _, _ in puzzles)
+        written = write_packed_puzzles(args.output, boards, size=args.size)
+    else:
+        out = open(args.output, "w") if args.output else sys.stdout
+        written = 0
+        try:
+            for puzzle, _, difficulty in puzzles:
+                clues = sum(1 for value in puzzle if value)
+                out.write(f"{''.join(CELL_SYMBOLS[value] for value in puzzle)} {difficulty} {clues}\n")
+                out.flush()
+                written += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"{written} puzzles in {elapsed:.2f} seconds ({written / elapsed * 60:.0f}/min)", file=sys.stderr)
+    if written < args.count:
+        band = f"{args.difficulty} " if args.difficulty else ""
+        print(f"Stopped {args.count - written} short: no {band}{args.size}x{args.size} puzzle "
+              f"came out of {MAX_FAILED_ROUNDS} rounds in a row.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
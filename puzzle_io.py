@@ -0,0 +1,227 @@
+"""
+Streaming puzzle readers and writers.
+
+Two on-disk formats are supported:
+
+- Text: one puzzle per line, 81 characters for a 9x9 board (256 for 16x16,
+  625 for 25x25), 0 or . for empty cells and 1-9 then A-Z for values from 10
+  up. Anything after the cells (separated by whitespace, e.g. a rating) is
+  ignored, as are blank lines and lines starting with #.
+- Packed: a short header followed by fixed-size records holding one cell per
+  4 bits, two cells per byte (41 bytes for a 9x9 puzzle instead of 82).
+  Boards larger than 15x15 use one byte per cell.
+
+Readers memory-map the file and yield one PuzzleRecord at a time, so millions
+of puzzles can be iterated in constant memory. A malformed record is reported
+through its error field instead of stopping the whole file.
+"""
+import mmap
+import struct
+from collections import namedtuple
+from math import isqrt
+
+import numpy as np
+
+PACKED_MAGIC = b"SDKP"
+PACKED_VERSION = 1
+PACKED_HEADER = struct.Struct("<4sBBH")  # magic, version, board side length, reserved
+PACKED_EXTENSION = ".sdkp"
+
+# index is 0-based over records; line is the 1-based line number for text files (None for packed files).
+# board is None when the record could not be parsed, and error then says why.
+PuzzleRecord = namedtuple("PuzzleRecord", ["index", "line", "board", "error"])
+
+
+CELL_SYMBOLS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"  # Symbol of each cell value in the text format.
+INVALID_CELL = 255
+_CELL_VALUES = np.full(256, INVALID_CELL, dtype=np.uint8)  # Byte -> cell value lookup table.
+_CELL_VALUES[ord(".")] = 0
+for _value, _symbol in enumerate(CELL_SYMBOLS):
+    _CELL_VALUES[ord(_symbol)] = _CELL_VALUES[ord(_symbol.lower())] = _value
+
+
+def board_size_for(cell_count):
+    """The side length of a board with cell_count cells (81 -> 9), or ValueError if there is none."""
+    size = isqrt(cell_count)
+    if size * size != cell_count or isqrt(size) ** 2 != size or not 0 < size < len(CELL_SYMBOLS):
+        raise ValueError(f"{cell_count} cells do not make a square board with square boxes (81, 256, 625, ...).")
+    return size
+
+
+def _parse_cells(cells, size=None):
+    """Parses the cell characters of one puzzle (bytes) into a size x size board; size=None infers it."""
+    if size is None:
+        size = board_size_for(len(cells))
+    if len(cells) != size * size:
+        raise ValueError(f"Expected {size * size} cells, got {len(cells)}.")
+    values = _CELL_VALUES[np.frombuffer(cells, dtype=np.uint8)]
+    if (values > size).any():
+        raise ValueError(f"Cells must be 0 or . for empty and values 1-{CELL_SYMBOLS[size]}.")
+    return values.astype(int).reshape(size, size)
+
+
+def parse_puzzle_string(text, size=None):
+    """
+    Parses one puzzle string (0 or . for empty cells) into a size x size board.
+    The size is inferred from the number of cells unless given. Raises ValueError if malformed.
+    """
+    fields = text.encode("ascii", "replace").split(maxsplit=1)
+    return _parse_cells(fields[0] if fields else b"", size)
+
+
+def board_to_string(board):
+    """Formats a board as its single-line text form, 0 for empty cells."""
+    return "".join(CELL_SYMBOLS[int(v)] for v in np.asarray(board).flat)
+
+
+def _map_file(file):
+    """Memory-maps an open file read-only; empty files get an empty bytes object instead."""
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # mmap refuses zero-length files.
+        return b""
+
+
+def read_text_puzzles(path, size=None):
+    """Yields a PuzzleRecord for every puzzle line of a text file; size=None infers each board's size."""
+    with open(path, "rb") as file:
+        data = _map_file(file)
+        try:
+            index = 0
+            position = 0
+            line_number = 0
+            while position < len(data):
+                end = data.find(b"\n", position)
+                if end < 0:
+                    end = len(data)
+                fields = data[position:end].split(maxsplit=1)
+                position = end + 1
+                line_number += 1
+                if not fields or fields[0].startswith(b"#"):
+                    continue
+                try:
+                    yield PuzzleRecord(index, line_number, _parse_cells(fields[0], size), None)
+                except ValueError as error:
+                    yield PuzzleRecord(index, line_number, None, str(error))
+                index += 1
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def write_text_puzzles(path, boards):
+    """Writes boards one per line in the text format. Returns the number of puzzles written."""
+    count = 0
+    with open(path, "w") as file:
+        for board in boards:
+            file.write(board_to_string(board) + "\n")
+            count += 1
+    return count
+
+
+def packed_record_size(size=9):
+    if size > 15:
+        return size * size
+    return (size * size + 1) // 2
+
+
+def pack_boards(boards):
+    """Packs an (N, size, size) array of boards into N records of 4 bits per cell (a byte per cell above 15x15)."""
+    boards = np.asarray(boards, dtype=np.uint8)
+    flat = boards.reshape(len(boards), -1)
+    if boards.shape[-1] > 15:
+        return flat
+    if flat.shape[1] % 2:
+        flat = np.concatenate([flat, np.zeros((len(flat), 1), dtype=np.uint8)], axis=1)
+    return (flat[:, 0::2] << 4) | flat[:, 1::2]
+
+
+def unpack_boards(records, size=9):
+    """Unpacks an (N, record_size) uint8 array back into (N, size, size) boards."""
+    records = np.asarray(records, dtype=np.uint8)
+    if size > 15:
+        return records.reshape(len(records), size, size)
+    flat = np.empty((len(records), records.shape[1] * 2), dtype=np.uint8)
+    flat[:, 0::2] = records >> 4
+    flat[:, 1::2] = records & 0x0F
+    return flat[:, :size * size].reshape(len(records), size, size)
+
+
+def write_packed_puzzles(path, boards, size=9, batch_size=65536):
+    """Writes boards (any iterable of size x size arrays) in the packed format. Returns the number written."""
+    if size > 255:
+        raise ValueError("The packed format stores at most a byte per cell, so it holds boards up to 255x255.")
+    count = 0
+    with open(path, "wb") as file:
+        file.write(PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, size, 0))
+        batch = []
+        for board in boards:
+            batch.append(np.asarray(board).reshape(size, size))
+            if len(batch) == batch_size:
+                file.write(pack_boards(batch).tobytes())
+                count += len(batch)
+                batch = []
+        if batch:
+            file.write(pack_boards(batch).tobytes())
+            count += len(batch)
+    return count
+
+
+def _read_packed_header(data, path):
+    if len(data) < PACKED_HEADER.size:
+        raise ValueError(f"{path} is too short to be a packed puzzle file.")
+    magic, version, size, _ = PACKED_HEADER.unpack_from(data)
+    if magic != PACKED_MAGIC or version != PACKED_VERSION:
+        raise ValueError(f"{path} is not a packed puzzle file (version {PACKED_VERSION}).")
+    return size
+
+
+def load_packed_boards(path, start=0, count=None):
+    """
+    Returns a slice of a packed file as an (N, size, size) uint8 array, decoded
+    with array operations. Only the requested records are read from disk.
+    """
+    with open(path, "rb") as file:
+        header = file.read(PACKED_HEADER.size)
+    size = _read_packed_header(header, path)
+    records = np.memmap(path, dtype=np.uint8, mode="r", offset=PACKED_HEADER.size)
+    record_size = packed_record_size(size)
+    total = len(records) // record_size
+    stop = total if count is None else min(total, start + count)
+    window = records[start * record_size:stop * record_size].reshape(-1, record_size)
+    return unpack_boards(window, size)
+
+
+def read_packed_puzzles(path, batch_size=4096):
+    """Yields a PuzzleRecord for every puzzle of a packed file, decoding batch_size records at a time."""
+    with open(path, "rb") as file:
+        data = _map_file(file)
+        try:
+            size = _read_packed_header(data, path)
+            record_size = packed_record_size(size)
+            body_size = len(data) - PACKED_HEADER.size
+            total = body_size // record_size
+            for start in range(0, total, batch_size):
+                stop = min(total, start + batch_size)
+                # Slicing the map copies just this batch, so no buffer stays exported when the map is closed.
+                chunk = np.frombuffer(data[PACKED_HEADER.size + start * record_size:PACKED_HEADER.size + stop * record_size],
+                                      dtype=np.uint8)
+                boards = unpack_boards(chunk.reshape(-1, record_size), size).astype(int)
+                invalid = (boards > size).reshape(len(boards), -1).any(axis=1)
+                for offset, board in enumerate(boards):
+                    if invalid[offset]:
+                        yield PuzzleRecord(start + offset, None, None, f"Cell values must be 0-{size}.")
+                    else:
+                        yield PuzzleRecord(start + offset, None, board, None)
+            if body_size % record_size:
+                yield PuzzleRecord(total, None, None, "Truncated record at the end of the file.")
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def read_puzzles(path, size=None):
+    """Yields PuzzleRecords from a text or packed file, chosen by the .sdkp extension."""
+    if str(path).endswith(PACKED_EXTENSION):
+        return read_packed_puzzles(path)
+    return read_text_puzzles(path, size)
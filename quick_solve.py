@@ -0,0 +1,86 @@
+"""
+Fast non-interactive text-mode solver for scripts.
+
+    python quick_solve.py                  # solves test.txt
+    python quick_solve.py puzzles.txt      # one puzzle per line (81 characters for 9x9)
+    echo 53..7....6..195... | python quick_solve.py -
+
+Reads the bracketed grid format that Combined_full.py writes to test.txt, or
+the one-line format of puzzle_io (one puzzle per line, 0 or . for empty, 1-9
+then A-Z for values from 10 on 16x16 and 25x25 boards), and prints every
+solution as one line in that format ("unsolvable" when there is none). The exit status is 0 when every puzzle was solved, 1 when some were
+not and 2 for unreadable input.
+
+Only the standard library and the pure-Python bitmask engine are imported, so
+a solve adds a few milliseconds to bare interpreter startup; NumPy, OpenCV and
+TensorFlow are never loaded. Set SUDOKU_STARTUP_REPORT=1 to see where the time goes.
+"""
+import startup_report
+import sys
+from math import isqrt
+
+from bitmask_solver import solve_cells
+
+# Same symbols as puzzle_io.CELL_SYMBOLS, repeated here so NumPy is never imported.
+CELL_SYMBOLS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _box_size(cell_count):
+    """The box side length of a board with cell_count cells (81 -> 3), or 0 if there is none."""
+    box = isqrt(isqrt(cell_count))
+    return box if box ** 4 == cell_count and box > 1 else 0
+
+
+def parse_grids(text):
+    """
+    Parses every puzzle in text into (flat list of cell values, box size) pairs.
+    Raises ValueError if the text is neither the bracketed grid nor the one-line format.
+    """
+    if text.lstrip().startswith("["):
+        # Bracketed format: "[", then one " [5 3 0 ...]" line per row, then "]".
+        rows = [line.strip()[1:-1].split() for line in text.splitlines()[1:] if line.strip() not in ("", "]")]
+        cells = [int(value) for row in rows for value in row]
+        if not _box_size(len(cells)) or any(len(row) != len(rows) for row in rows):
+            raise ValueError("Expected a square grid with square boxes (9 rows of 9 numbers, 16 of 16, ...).")
+        if any(not 0 <= value <= len(rows) for value in cells):
+            raise ValueError(f"Expected values 0-{len(rows)} in a {len(rows)}x{len(rows)} grid.")
+        return [(cells, _box_size(len(cells)))]
+
+    grids = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        fields = line.split(maxsplit=1)
+        if not fields or fields[0].startswith("#"):
+            continue
+        symbols = fields[0].upper().replace(".", "0")
+        box = _box_size(len(symbols))
+        if not box or any(symbol not in CELL_SYMBOLS[:box * box + 1] for symbol in symbols):
+            raise ValueError(f"Line {number} is not a puzzle (81 characters for 9x9, 256 for 16x16, ...).")
+        grids.append(([CELL_SYMBOLS.index(symbol) for symbol in symbols], box))
+    return grids
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else "test.txt"
+    try:
+        text = sys.stdin.read() if path == "-" else open(path).read()
+        grids = parse_grids(text)
+    except (OSError, ValueError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 2
+    startup_report.mark("input parsed")
+
+    unsolved = 0
+    for grid, box in grids:
+        solution = solve_cells(grid, box)
+        if solution is None:
+            unsolved += 1
+            print("unsolvable")
+        else:
+            print("".join(CELL_SYMBOLS[value] for value in solution))
+    startup_report.mark("solved")
+    return 1 if unsolved else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Solution cache keyed by the canonical form of a puzzle.
+
+Relabeling the digits, transposing, swapping rows inside a band, swapping
+whole bands (and the same for columns and stacks) turns a puzzle into an
+equivalent one whose solution is transformed the same way. canonical_form
+picks one representative of all those variants: rows and columns are ordered
+by keys that none of the symmetries change, the few orders that tie are all
+tried, and the lexicographically smallest grid after relabeling the digits in
+order of first appearance wins. The cache stores solutions of canonical grids
+in a bounded LRU, optionally backed by an SQLite file, and maps them back into
+the caller's orientation.
+
+    cache = SolutionCache(maxsize=10000, path="solutions.sqlite")
+    stats = cache.solve(board)        # Same contract as solve_sudoku.solve_board.
+    cache.metrics()                   # {"hits": ..., "hit_rate": ...}
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from itertools import permutations, product
+from math import factorial, isqrt, prod
+
+import numpy as np
+
+import tracing
+from solver_stats import SolveStats
+
+# Row/column orders tried per orientation before giving up on full
+# canonicalization. Past this the first order is used: lookups stay correct and
+# exact repeats still hit, only some symmetric variants of very regular grids
+# are missed.
+MAX_CANDIDATES = 4096
+
+# canonical = digits[(board.T if transpose else board)[np.ix_(rows, cols)]]
+Transform = namedtuple("Transform", ["transpose", "rows", "cols", "digits"])
+
+
+def _tied_orders(items, keys):
+    """Every order of items sorted by key, permuting only the items whose keys tie."""
+    ordered = sorted(items, key=lambda item: keys[item])
+    groups = []
+    for item in ordered:
+        if groups and keys[groups[-1][0]] == keys[item]:
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+    return [sum(choice, ()) for choice in product(*(list(permutations(group)) for group in groups))]
+
+
+def _count_tied_orders(items, keys):
+    counts = {}
+    for item in items:
+        counts[keys[item]] = counts.get(keys[item], 0) + 1
+    return prod(factorial(count) for count in counts.values())
+
+
+def _line_orders(grid, box, limit):
+    """
+    Candidate row orders: bands and the rows inside each band sorted by keys that
+    digit relabeling and column/stack permutations leave alone. Returns an
+    (orders, n) index array, or just the first order when there are more than limit.
+    """
+    filled = grid > 0
+    column_counts = filled.sum(axis=0)
+    row_keys = [tuple(sorted(column_counts[filled[row]])) for row in range(len(grid))]
+    bands = [tuple(range(band * box, (band + 1) * box)) for band in range(box)]
+    band_keys = [tuple(sorted(row_keys[row] for row in rows)) for rows in bands]
+
+    total = _count_tied_orders(range(box), band_keys) * prod(_count_tied_orders(rows, row_keys) for rows in bands)
+    if total > limit:
+        within = [_tied_orders(rows, row_keys)[0] for rows in bands]
+        return np.array([sum((within[band] for band in sorted(range(box), key=lambda band: band_keys[band])), ())])
+
+    within = [_tied_orders(rows, row_keys) for rows in bands]
+    orders = []
+    for band_order in _tied_orders(range(box), band_keys):
+        orders.extend(sum(choice, ()) for choice in product(*(within[band] for band in band_order)))
+    return np.array(orders)
+
+
+def _relabel(flat, size):
+    """Relabels every row of a (K, cells) array in order of first appearance; returns (relabeled, mappings)."""
+    digits = np.arange(1, size + 1)
+    seen = flat[:, :, None] == digits
+    # Digits that never appear are numbered after the others, in their own order.
+    first = np.where(seen.any(axis=1), seen.argmax(axis=1), flat.shape[1] + digits)
+    mappings = np.zeros((len(flat), size + 1), dtype=np.uint8)
+    mappings[:, 1:] = np.argsort(np.argsort(first, axis=1), axis=1) + 1
+    return np.take_along_axis(mappings, flat.astype(np.intp), axis=1), mappings
+
+
+def canonical_form(board, max_candidates=MAX_CANDIDATES):
+    """
+    Returns (canonical, transform) for a square board (0 for empty): the canonical
+    grid as a uint8 array and the Transform that produces it from board.
+    """
+    board = np.asarray(board)
+    size = len(board)
+    box = isqrt(size)
+    if box * box != size or board.shape != (size, size):
+        raise ValueError(f"Board must be square with a square side length, got shape {board.shape}")
+
+    best = None
+    for transpose in (False, True):
+        grid = board.T if transpose else board
+        rows = _line_orders(grid, box, max_candidates)
+        cols = _line_orders(grid.T, box, max(max_candidates // len(rows), 1))
+        candidates = grid[rows[:, None, :, None], cols[None, :, None, :]].reshape(-1, size * size)
+        relabeled, mappings = _relabel(candidates, size)
+        pick = np.lexsort(relabeled.T[::-1])[0]
+        if best is None or tuple(relabeled[pick]) < tuple(best[0]):
+            row_index, col_index = divmod(pick, len(cols))
+            best = relabeled[pick], Transform(transpose, rows[row_index], cols[col_index], mappings[pick])
+    canonical, transform = best
+    return canonical.reshape(size, size), transform
+
+
+def restore(canonical_board, transform):
+    """Maps a board in canonical orientation (e.g. a cached solution) back to the original orientation."""
+    inverse = np.zeros_like(transform.digits)
+    inverse[transform.digits] = np.arange(len(transform.digits))
+    board = np.empty_like(canonical_board)
+    board[np.ix_(transform.rows, transform.cols)] = inverse[canonical_board]
+    return board.T if transform.transpose else board
+
+
+class SolutionCache:
+    """
+    LRU cache of solutions in front of solve_sudoku.solve_board.
+
+    Parameters:
+    - maxsize: Canonical puzzles kept in memory.
+    - path: Optional SQLite file that keeps every solution across runs and processes.
+    - solver: Function with the solve_board contract used on a miss (default: solve_board).
+
+    Thread-safe, so one cache can serve every request thread of the service.
+    """
+
+    def __init__(self, maxsize=4096, path=None, solver=None):
+        self.maxsize = maxsize
+        self.solver = solver
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions ("
+                             "engine TEXT, puzzle BLOB, solution BLOB, stats TEXT, PRIMARY KEY (engine, puzzle))")
+            self._db.commit()
+
+    def solve(self, board, engine="bitmask", budget=None):
+        """
+        Solves the board in place and returns a SolveStats, like solve_board. On a
+        hit the stats are those of the original solve with cached set and elapsed
+        replaced by the lookup time. A search stopped by budget is not cached.
+        """
+        started = time.perf_counter()
+        with tracing.span("cache.canonical_form"):
+            canonical, transform = canonical_form(board)
+        key = (engine, canonical.tobytes())
+        entry = self._lookup(key)
+        if entry is None:
+            solution = canonical.astype(int)
+            stats = self._solve(solution, engine, budget)
+            entry = (solution.astype(np.uint8) if stats.solved else None, stats.to_dict())
+            self._store(key, entry)
+        else:
+            stats = SolveStats(**{**entry[1], "techniques": set(entry[1]["techniques"]), "cached": True})
+
+        if entry[0] is not None:
+            board[:] = restore(entry[0], transform)
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    def _solve(self, board, engine, budget):
+        solver = self.solver
+        if solver is None:
+            from solve_sudoku import solve_board as solver
+        return solver(board, engine, budget)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                tracing.count("cache.hits")
+                return entry
+            if self._db is not None:
+                row = self._db.execute("SELECT solution, stats FROM solutions WHERE engine = ? AND puzzle = ?", key).fetchone()
+                if row is not None:
+                    solution = None if row[0] is None else np.frombuffer(row[0], dtype=np.uint8).reshape(isqrt(len(row[0])), -1)
+                    entry = (solution, json.loads(row[1]))
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+                    tracing.count("cache.disk_hits")
+                    return entry
+            self.misses += 1
+            tracing.count("cache.misses")
+            return None
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                solution = None if entry[0] is None else entry[0].tobytes()
+                self._db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)", (*key, solution, json.dumps(entry[1])))
+                self._db.commit()
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def metrics(self):
+        """Hit counts and rates; disk hits are lookups served by the SQLite file after missing in memory."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "lookups": lookups,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
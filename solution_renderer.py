@@ -0,0 +1,229 @@
+"""
+Batch rendering of solved boards.
+
+Digits are rasterized once per board size and cell size into a glyph atlas
+(every digit premultiplied by every fill color, plus its coverage) and
+boards are composited from it by blending the glyph windows of all their
+filled cells in one cv2.multiply/cv2.add, instead of a cv2.putText call per
+cell. Boards that share a size and
+background shape are rendered together as one stacked array:
+
+    images = render_boards(puzzles, solutions)                      # blank grids
+    images = render_boards(puzzles, solutions, backgrounds=warped)   # on the warped grids
+    write_images(images, [f"out/{i}.png" for i in range(len(images))])
+    png_bytes = encode_images(images)
+
+render_on_photos draws the same overlay back onto the original photos through
+the homography of sudoku_pipeline.extract_grid. Nothing is read from disk.
+"""
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+import tracing
+from sudoku_pipeline import WARPED_CELL_SIZE
+
+# Fill colors (BGR), indexed by the layer codes below.
+AUTO_FILL = 0   # Green: filled in by the solver.
+REVEALED = 1    # Magenta: revealed by the system.
+GUESSED = 2     # Cyan: correct user guess.
+INCORRECT = 3   # Red: incorrect user guess.
+COLORS = np.array([(0, 255, 0), (255, 0, 255), (255, 255, 0), (0, 0, 255)], dtype=np.uint16)
+
+
+@lru_cache(maxsize=32)
+def glyph_atlas(size, cell_size):
+    """
+    The digits 1..size drawn in a cell_size square, placed like the old
+    per-cell putText and cropped to the window (y0, y1, x0, x1) of the cell
+    that any digit inks. Returns (window, glyphs, inverse): glyphs[color, value]
+    is a digit premultiplied by a fill color and inverse[value] its 255 -
+    coverage, both (h, w, 3) uint8; value 0 is blank.
+    """
+    width = len(str(size))
+    # Scaled so a one-digit number fills a 30 pixel cell like on the 9x9 photos; two-digit numbers get half.
+    font_scale = cell_size / 30 / width
+    thickness = max(1, round(2 * font_scale))
+    origin = (int(cell_size * 0.25 / width), int(cell_size * 0.8))
+    alpha = np.zeros((size + 1, cell_size, cell_size), dtype=np.uint8)
+    for value in range(1, size + 1):
+        cv2.putText(alpha[value], str(value), origin, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 255, thickness, cv2.LINE_AA)
+    ys, xs = np.nonzero(alpha.max(axis=0))
+    y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    alpha = alpha[:, y0:y1, x0:x1, None].astype(np.uint16)
+    glyphs = ((alpha[None] * COLORS[:, None, None, None, :] + 127) // 255).astype(np.uint8)
+    inverse = np.repeat(255 - alpha, 3, axis=-1).astype(np.uint8)
+    return (y0, y1, x0, x1), glyphs, inverse
+
+
+@lru_cache(maxsize=8)
+def blank_grid(size, cell_size=WARPED_CELL_SIZE):
+    """An empty size x size grid (white background, thicker lines between boxes) to write the numbers on. Do not modify it."""
+    box = int(round(size ** 0.5))
+    side = size * cell_size
+    image = np.full((side, side, 3), 255, dtype=np.uint8)
+    for i in range(size + 1):
+        thickness = 2 if i % box == 0 else 1
+        position = min(i * cell_size, side - 1)
+        cv2.line(image, (position, 0), (position, side - 1), (0, 0, 0), thickness)
+        cv2.line(image, (0, position), (side - 1, position), (0, 0, 0), thickness)
+    image.flags.writeable = False
+    return image
+
+
+def overlay_layers(original, solution, current=None, revealed=(), guessed=(), incorrect=()):
+    """
+    What to draw in every cell of one board, as (values, colors) int arrays:
+    nothing on the givens, the user's numbers on guessed, incorrect and
+    revealed cells (taken from current), and the solution everywhere else.
+    """
+    original, solution = np.asarray(original), np.asarray(solution)
+    values = np.where(original == 0, solution, 0)
+    colors = np.full(values.shape, AUTO_FILL)
+    current = solution if current is None else np.asarray(current)
+    # Later layers win, in the priority the interactive board uses: incorrect, then guessed, then revealed.
+    for positions, color in ((revealed, REVEALED), (guessed, GUESSED), (incorrect, INCORRECT)):
+        for row, col in positions:
+            if original[row, col] == 0:
+                values[row, col] = current[row, col]
+                colors[row, col] = color
+    return values, colors
+
+
+def _windows(images, size, cell_size, window):
+    """A (B, size, size, h, w, ...) view of the glyph window of every cell of a stack of images."""
+    y0, y1, x0, x1 = window
+    side = size * cell_size
+    cells = images[:, :side, :side].reshape(len(images), size, cell_size, size, cell_size, *images.shape[3:])
+    return cells[:, :, y0:y1, :, x0:x1].swapaxes(2, 3)
+
+
+def _blit(images, values, colors, cell_size):
+    """
+    Blends the glyphs of a stack of boards ((B, size, size) values and colors)
+    into images ((B, side, side, 3) uint8) in place. Only the glyph windows of
+    the cells that get a digit are touched, in one cv2 multiply and add.
+    """
+    window, glyphs, inverse = glyph_atlas(values.shape[1], cell_size)
+    board, row, col = np.nonzero(values)
+    if not len(board):
+        return
+    digits = values[board, row, col]
+    windows = _windows(images, values.shape[1], cell_size, window)
+    region = windows[board, row, col].reshape(len(board), -1)
+    shaded = cv2.multiply(region, inverse[digits].reshape(len(board), -1), scale=1 / 255)
+    blended = cv2.add(shaded, glyphs[colors[board, row, col], digits].reshape(len(board), -1))
+    windows[board, row, col] = blended.reshape(len(board), *inverse.shape[1:])
+
+
+def _as_bgr(image):
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image
+
+
+def render_boards(originals, solutions, backgrounds=None, currents=None, marks=None, cell_size=WARPED_CELL_SIZE):
+    """
+    Renders many solved boards at once.
+
+    Parameters:
+    - originals, solutions: The puzzles (0 for empty) and their solutions.
+    - backgrounds: Optional grid image per board (e.g. the warped grid of
+      process_image, or None for a blank grid); its cell size follows from its side.
+    - currents: Optional board the user filled in, per board.
+    - marks: Optional (revealed, guessed, incorrect) (row, col) collections per
+      board, as kept by a sudoku_session.SudokuSession.
+    - cell_size: Cell size of the blank grids.
+
+    Returns a list of BGR uint8 images in input order.
+    """
+    count = len(originals)
+    backgrounds = backgrounds if backgrounds is not None else [None] * count
+    currents = currents if currents is not None else [None] * count
+    marks = marks if marks is not None else [((), (), ())] * count
+
+    groups = {}
+    for index in range(count):
+        size = len(originals[index])
+        background = backgrounds[index]
+        background = blank_grid(size, cell_size) if background is None else _as_bgr(background)
+        values, colors = overlay_layers(originals[index], solutions[index], currents[index], *marks[index])
+        groups.setdefault((size, background.shape), []).append((index, background, values, colors))
+
+    images = [None] * count
+    with tracing.span("render", boards=count):
+        for (size, shape), members in groups.items():
+            stacked = np.stack([member[1] for member in members])
+            _blit(stacked, np.stack([member[2] for member in members]), np.stack([member[3] for member in members]),
+                  shape[0] // size)
+            for (index, _, _, _), image in zip(members, stacked):
+                images[index] = image
+    return images
+
+
+def _photo_cell_size(homography, size, photo_shape):
+    """Cell size that matches the grid's resolution in the photo, so warped digits stay sharp."""
+    side = size * WARPED_CELL_SIZE
+    square = np.float32([[0, 0], [side, 0], [side, side], [0, side]]).reshape(-1, 1, 2)
+    corners = cv2.perspectiveTransform(square, np.linalg.inv(homography)).reshape(-1, 2)
+    longest = max(np.linalg.norm(corners[i] - corners[(i + 1) % 4]) for i in range(4))
+    return int(np.clip(longest / size, WARPED_CELL_SIZE, max(photo_shape[:2]) / size))
+
+
+def render_on_photos(originals, solutions, photos, homographies, currents=None, marks=None):
+    """
+    Draws the solution digits onto the original photos, in perspective.
+
+    homographies are those returned by sudoku_pipeline.extract_grid (photo to
+    warped grid); the other arguments are as for render_boards. Returns a
+    list of BGR uint8 images the size of the photos.
+    """
+    count = len(originals)
+    currents = currents if currents is not None else [None] * count
+    marks = marks if marks is not None else [((), (), ())] * count
+    images = []
+    with tracing.span("render_on_photos", boards=count):
+        for index in range(count):
+            photo = _as_bgr(photos[index])
+            size = len(originals[index])
+            homography = np.asarray(homographies[index], dtype=np.float64)
+            cell = _photo_cell_size(homography, size, photo.shape)
+            values, colors = overlay_layers(originals[index], solutions[index], currents[index], *marks[index])
+            # Draw the glyphs on a transparent overlay: premultiplied color plus coverage as a fourth channel.
+            side = size * cell
+            color = np.zeros((1, side, side, 3), dtype=np.uint8)
+            _blit(color, values[None], colors[None], cell)
+            coverage = np.zeros((1, side, side), dtype=np.uint8)
+            window, _, inverse = glyph_atlas(size, cell)
+            row, col = np.nonzero(values)
+            _windows(coverage, size, cell, window)[0, row, col] = 255 - inverse[values[row, col], :, :, 0]
+            overlay = np.dstack((color[0], coverage[0]))
+            # Map overlay pixels to warped-grid pixels, then back into the photo.
+            scale = np.diag([WARPED_CELL_SIZE / cell, WARPED_CELL_SIZE / cell, 1.0])
+            to_photo = np.linalg.inv(homography) @ scale
+            height, width = photo.shape[:2]
+            warped = cv2.warpPerspective(overlay, to_photo, (width, height), flags=cv2.INTER_LINEAR)
+            # The color is already premultiplied, so only the photo is shaded by the coverage.
+            shade = cv2.cvtColor(255 - warped[:, :, 3], cv2.COLOR_GRAY2BGR)
+            image = cv2.add(cv2.multiply(photo, shade, scale=1 / 255), warped[:, :, :3])
+            images.append(image)
+    return images
+
+
+def encode_images(images, extension=".png"):
+    """Encodes rendered images (to PNG by default) and returns their bytes."""
+    encoded = []
+    with tracing.span("encode_images", images=len(images)):
+        for image in images:
+            ok, buffer = cv2.imencode(extension, image)
+            if not ok:
+                raise ValueError(f"Could not encode an image as {extension}.")
+            encoded.append(buffer.tobytes())
+    return encoded
+
+
+def write_images(images, paths):
+    """Writes rendered images to the given paths (the format follows each extension)."""
+    with tracing.span("write_images", images=len(images)):
+        for image, path in zip(images, paths):
+            if not cv2.imwrite(str(path), image):
+                raise ValueError(f"Could not write image {path}.")
@@ -1,13 +1,12 @@
 import numpy as np
 import time
-import random
-import cv2
-from Save_Solution_as_Image import save_as_image
-
-# Global lists to record positions
-system_revealed_positions = []   # For cells revealed randomly by option 1 (magenta)
-user_guess_positions = []        # For cells filled correctly by the user (cyan)
-incorrect_guess_positions = []   # For cells where the user entered an incorrect guess (red)
+from math import isqrt
+import bitmask_solver
+import dlx_solver
+import tracing
+from solver_limits import CANCELLED, SearchBudget, SearchInterrupted
+from solver_stats import SolveResult, SolveStats
+from sudoku_session import SudokuSession
 
 # ANSI color codes (you can adjust if needed)
 WHITE   = "\033[97m"   # For originally loaded board numbers.
@@ -17,29 +16,32 @@ RED     = "\033[91m"   # For incorrect user guesses.
 GREEN   = "\033[92m"   # For auto-filled (solver-filled) numbers in fully solved mode.
 RESET   = "\033[0m"    # Reset color.
 
-def print_board_colored(board, original_board, fully_solved=False):
+def print_board_colored(board, original_board, fully_solved=False, session=None):
     """
-    Prints the Sudoku board with colors as follows:
+    Prints the Sudoku board with colors as follows (guesses and reveals are
+    looked up in session, a sudoku_session.SudokuSession):
       - Cells originally loaded from the puzzle (nonzero in original_board) are white.
       - Cells where the user entered a correct guess are cyan.
       - Cells where the user entered an incorrect guess are red.
       - Cells revealed by the system (option 1) are magenta.
       - In fully solved mode (fully_solved=True), any remaining cells (auto-filled) are printed in green.
     """
-    for i in range(9):
-        if i % 3 == 0 and i != 0:
-            print("-" * 25)
-        for j in range(9):
+    size, box, width = _board_layout(board)
+    for i in range(size):
+        if i % box == 0 and i != 0:
+            print("-" * _separator_length(size, box, width))
+        for j in range(size):
             cell = board[i][j]
             # Decide which color to use based on the cell's origin:
+            origin = session.origin(i, j) if session is not None else None
             if original_board[i][j] != 0:
                 # Pre-filled cell from the file → white.
                 color = WHITE
-            elif (i, j) in user_guess_positions:
+            elif origin == "guessed":
                 color = CYAN
-            elif (i, j) in incorrect_guess_positions:
+            elif origin == "incorrect":
                 color = RED
-            elif (i, j) in system_revealed_positions:
+            elif origin == "revealed":
                 color = MAGENTA
             else:
                 # For cells that are auto-filled by the solver:
@@ -47,24 +49,34 @@ def print_board_colored(board, original_board, fully_solved=False):
                     color = GREEN
                 else:
                     color = RESET  # No special color in interactive mode.
-            cell_str = str(cell) if cell != 0 else "-"
-            if j % 3 == 0 and j != 0:
+            cell_str = (str(cell) if cell != 0 else "-").rjust(width)
+            if j % box == 0 and j != 0:
                 print("|", end=" ")
             print(f"{color}{cell_str}{RESET}", end=" ")
         print()
     print()
 
+def _board_layout(board):
+    """Returns (size, box size, cell width) for printing a board of any square size."""
+    size = len(board)
+    return size, isqrt(size), len(str(size))
+
+def _separator_length(size, box, width):
+    """Length of the horizontal line between bands: the cells plus the "| " between boxes."""
+    return size * (width + 1) + (box - 1) * 2 - 1
+
 def print_board(board):
     """Prints the Sudoku board in a readable format."""
-    for i in range(len(board)):
-        if i % 3 == 0 and i != 0:
-            print("-" * 25)
+    size, box, width = _board_layout(board)
+    for i in range(size):
+        if i % box == 0 and i != 0:
+            print("-" * _separator_length(size, box, width))
         
-        for j in range(len(board[0])):
-            if j % 3 == 0 and j != 0:
+        for j in range(size):
+            if j % box == 0 and j != 0:
                 print("|", end=" ")
 
-            print(board[i][j] if board[i][j] != 0 else "-", end=" ")
+            print(str(board[i][j] if board[i][j] != 0 else "-").rjust(width), end=" ")
         
         print()
     print("\n")
@@ -89,22 +101,23 @@ def is_Valid(board, position, number):
     if number in board[:, col]:
         return False
 
-    # Check 3x3 subgrid
-    cube_x, cube_y = (col // 3) * 3, (row // 3) * 3
-    if number in board[cube_y:cube_y+3, cube_x:cube_x+3]:
+    # Check the box (3x3 on a 9x9 board)
+    box = isqrt(len(board))
+    cube_x, cube_y = (col // box) * box, (row // box) * box
+    if number in board[cube_y:cube_y+box, cube_x:cube_x+box]:
         return False
 
     return True
 
-recursion_calls = 0
-backtracks = 0
-max_depth = 0
-
-def solve_board(board, depth=0):
-    """Solves the Sudoku board using backtracking."""
-    global recursion_calls, backtracks, max_depth
-    recursion_calls += 1
-    max_depth = max(max_depth, depth)
+def solve_board_backtracking(board, depth=0, stats=None, budget=None):
+    """Solves the Sudoku board using plain backtracking (kept as the reference engine)."""
+    if stats is None:
+        stats = SolveStats(engine="backtracking")
+    if budget is not None:
+        budget.visit(depth)
+    stats.nodes += 1
+    stats.max_depth = max(stats.max_depth, depth)
+    stats.techniques.add("backtracking")
 
     empty_position = find_empty_position(board)
     if not empty_position:
@@ -112,18 +125,103 @@ def solve_board(board, depth=0):
 
     row, col = empty_position
 
-    for i in range(1, 10):
+    for i in range(1, len(board) + 1):
         if is_Valid(board, (row, col), i):
             board[row][col] = i  # Place number
 
-            if solve_board(board, depth + 1):  # Recur
+            if solve_board_backtracking(board, depth + 1, stats, budget):  # Recur
                 return True
 
             board[row][col] = 0  # Undo (backtrack)
-            backtracks += 1
+            stats.backtracks += 1
 
     return False  # No valid number found
 
+# Solver engines selectable through solve_board(board, engine=...).
+# Each one solves the board in place, returns True or False, fills the stats it is given
+# and charges the optional solver_limits.SearchBudget once per search node.
+SOLVER_ENGINES = {
+    "bitmask": bitmask_solver.solve,
+    "backtracking": solve_board_backtracking,
+    "dlx": dlx_solver.solve,
+}
+
+def solve_board(board, engine="bitmask", budget=None):
+    """
+    Solves the Sudoku board in place and returns a SolveStats for this solve.
+    The stats are truthy exactly when a solution was found, so `if solve_board(board):` still works.
+    - "bitmask" (default) uses constraint propagation with MRV branching.
+    - "backtracking" is the original cell-by-cell backtracker.
+    - "dlx" uses exact cover with Dancing Links.
+    With a solver_limits.SearchBudget the search may stop with SearchInterrupted, whose stats
+    attribute then holds the counts so far (the backtracker can leave the board partly filled).
+    """
+    if engine not in SOLVER_ENGINES:
+        raise ValueError(f"Unknown solver engine {engine!r}. Choose from: {', '.join(SOLVER_ENGINES)}")
+    stats = SolveStats(engine=engine)
+    start_time = time.perf_counter()
+    try:
+        with tracing.span("solve", engine=engine):
+            stats.solved = bool(SOLVER_ENGINES[engine](board, stats=stats, budget=budget))
+    except SearchInterrupted as error:
+        error.stats = stats
+        raise
+    finally:
+        stats.elapsed = time.perf_counter() - start_time
+        tracing.count("solver.nodes", stats.nodes)
+        tracing.count("solver.backtracks", stats.backtracks)
+    return stats
+
+def solve_with_limits(board, engine="bitmask", timeout=None, max_nodes=None, cancel=None, progress=None, progress_interval=1000):
+    """
+    Solves a copy of the board within a time and/or node budget and returns a SolveResult
+    whose status is "solved", "unsolvable", "budget_exceeded" or "cancelled".
+
+    Parameters:
+    - timeout: Seconds the search may take.
+    - max_nodes: Search nodes the search may visit.
+    - cancel: solver_limits.CancellationToken that stops the search when cancelled.
+    - progress: Callback progress(nodes, depth, elapsed_seconds), called every progress_interval nodes.
+    """
+    solution = board.copy()
+    budget = SearchBudget(timeout, max_nodes, cancel, progress, progress_interval)
+    try:
+        stats = solve_board(solution, engine, budget)
+    except SearchInterrupted as error:
+        status = "cancelled" if error.reason == CANCELLED else "budget_exceeded"
+        return SolveResult(status, None, error.stats, error.reason)
+    if stats:
+        return SolveResult("solved", solution, stats)
+    return SolveResult("unsolvable", None, stats)
+
+async def solve_async(board, engine="bitmask", timeout=None, max_nodes=None, progress=None, executor=None):
+    """
+    Awaitable solve_with_limits that runs the search on an executor thread, so the event loop
+    stays responsive. The search itself enforces the timeout; cancelling the awaiting task
+    (e.g. through asyncio.wait_for or a closed client connection) also stops the search.
+    """
+    import asyncio
+    from functools import partial
+    from solver_limits import CancellationToken
+
+    cancel = CancellationToken()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, partial(solve_with_limits, board, engine, timeout, max_nodes, cancel, progress))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        cancel.cancel()
+        raise
+
+def count_solutions(board, limit=2, budget=None):
+    """
+    Counts the solutions of the board (without modifying it), stopping once limit is reached.
+    With the default limit, 0 means no solution, 1 a unique solution and 2 more than one.
+    A solver_limits.SearchBudget makes it raise SearchInterrupted instead of searching on.
+    """
+    with tracing.span("count_solutions"):
+        return dlx_solver.count_solutions(board, limit, budget)
+
 def classify_sudoku_difficulty(recursive_calls, backtracks):
     """Classifies Sudoku difficulty based on recursion and backtrack calls."""
     avg_calls = (recursive_calls + backtracks) // 2
@@ -134,12 +232,41 @@ def classify_sudoku_difficulty(recursive_calls, backtracks):
     else:
         return "Hard"
 
+# Calibrated on the bundled easy/, moderate/ and hard/ photos: the hard ones are the
+# only ones singles cannot finish, and moderate ones need more rounds of singles.
+EASY_MAX_PROPAGATIONS = 15
+
+def grade_difficulty(stats):
+    """
+    Grades difficulty from the SolveStats of one solve.
+    - Backtracker stats use the original call-count thresholds.
+    - Otherwise: Easy if a few rounds of singles finish the puzzle, Moderate if
+      singles alone finish it but need more rounds, Hard if the search has to guess.
+    """
+    if stats.engine == "backtracking":
+        return classify_sudoku_difficulty(stats.nodes, stats.backtracks)
+    if stats.guesses:
+        return "Hard"
+    if stats.propagations <= EASY_MAX_PROPAGATIONS:
+        return "Easy"
+    return "Moderate"
+
 def load_sudoku_from_file(filename):
-    """Loads a Sudoku grid from a text file without commas."""
+    """
+    Loads a Sudoku grid of any square size (9x9, 16x16, 25x25, ...) from a text file without commas.
+    Files in the one-line format (see puzzle_io) are accepted too; the first puzzle is loaded.
+    """
     try:
         with open(filename, "r") as file:
-            lines = file.readlines()[1:-1]  # Skip first and last bracket
-            sudoku_grid = np.array([list(map(int, line.strip()[1:-1].split())) for line in lines])
+            lines = file.readlines()
+        if lines and not lines[0].lstrip().startswith("["):
+            from puzzle_io import parse_puzzle_string
+            return parse_puzzle_string(next((line for line in lines if line.strip()), ""))
+        lines = lines[1:-1]  # Skip first and last bracket
+        sudoku_grid = np.array([list(map(int, line.strip()[1:-1].split())) for line in lines])
+        size = len(sudoku_grid)
+        if sudoku_grid.shape != (size, size) or isqrt(size) ** 2 != size or not ((0 <= sudoku_grid) & (sudoku_grid <= size)).all():
+            raise ValueError(f"{sudoku_grid.shape} is not a square board with square boxes")
         return sudoku_grid
     except FileNotFoundError:
         print(f"Error: {filename} not found.")
@@ -148,59 +275,44 @@ def load_sudoku_from_file(filename):
         print(f"Error: {filename} has an invalid format.")
         exit()
 
-def reveal_numbers(current_board, solution_board, num_reveals):
+def reveal_numbers(current_board, solution_board, num_reveals, session=None):
     """Reveals a given number of solved cells on top of the existing board.
-       Returns the updated board and records the positions revealed by the system."""
-    global system_revealed_positions
-    available_positions = [(r, c) for r in range(9) for c in range(9) if current_board[r, c] == 0]
-    
-    num_reveals = min(num_reveals, len(available_positions))  # Avoid errors
-    
-    revealed_positions = random.sample(available_positions, num_reveals)
-    system_revealed_positions.extend(revealed_positions)  # Record these positions
-
-    for (r, c) in revealed_positions:
+       Returns the updated board; the revealed positions are recorded in session (a SudokuSession) when given."""
+    if session is None:
+        session = SudokuSession(current_board, solution_board)
+    for (r, c) in session.reveal(num_reveals):
         current_board[r, c] = solution_board[r, c]  # Reveal correct solution
 
     return current_board  # Return updated board
 
-def is_valid_placement(initial_board, solution_board, row, col, num):
+def is_valid_placement(initial_board, solution_board, row, col, num, session=None):
     """
     Checks if a user-entered number is valid for the given cell.
     - Prevents checking pre-filled cells from the original puzzle.
     - Returns detailed feedback on why a number is incorrect.
+    The check is answered by session (a SudokuSession over the same puzzle) without scanning the board.
     """
-    if initial_board[row][col] != 0:
-        return False, "This cell was pre-filled in the original puzzle. Choose an empty cell."
-
-    correct_num = solution_board[row][col]
-    
-    if num == correct_num:
+    if session is None:
+        session = SudokuSession(initial_board, solution_board)
+    correct, message = session.check(row, col, num)
+    if correct:
         # If the number is correct, print the updated board
         print("Correct! The number is part of the solution.\n")
-        initial_board[row][col] = correct_num
+        initial_board[row][col] = num
         print_board(initial_board)
-        return True, f"Correct! The number is part of the solution."
-    # Check row conflict
-    if num in solution_board[row]:
-        return False, f"Incorrect! The number {num} is not a part of the solution."
-
-    # Check column conflict
-    if num in solution_board[:, col]:
-        return False, f"Incorrect! The number {num} is not a part of the solution."
-
-    # Check 3x3 subgrid conflict
-    start_row, start_col = (row // 3) * 3, (col // 3) * 3
-    subgrid = solution_board[start_row:start_row+3, start_col:start_col+3]
-    if num in subgrid:
-        return False, f"Incorrect! The number {num} already exists in this 3x3 box."
-
-    # Default case: The number is incorrect but does not violate row, column, or grid rules.
-    return False, f"Incorrect! The correct number for this cell is {correct_num}."
-
-def interactive_sudoku(initial_board, solution_board):
-    """Interactive session with visual feedback."""
+    return correct, message
+
+def interactive_sudoku(initial_board, solution_board, grid_image=None, solve_stats=None, photo=None, homography=None):
+    """
+    Interactive session with visual feedback.
+    grid_image is the warped grid used when saving the solution as an image, and
+    solve_stats the SolveStats of the solve that produced solution_board (used to grade difficulty).
+    Given the original photo and the homography from the pipeline, the saved solution is also drawn onto the photo.
+    The game state lives in a SudokuSession, so several games can run in one process.
+    """
     original_board = initial_board.copy()  # Keep original for reference (pre-filled cells).
+    size = len(initial_board)
+    session = SudokuSession(original_board, solution_board)
     difficulty_revealed = False  # Flag for option 2.
 
     while True:
@@ -211,17 +323,19 @@ def interactive_sudoku(initial_board, solution_board):
         print("4: Check a number option for a cell")
         print("5: Save final solution as an image")
         print("6: Exit")
+        print("7: Show a hint for the next cell")
         choice = input("Please make your choice: ")
 
         if choice == "1":
             num_reveals = int(input("Please enter the number of cells you want to be revealed: "))
-            initial_board = reveal_numbers(initial_board, solution_board, num_reveals)
+            initial_board = reveal_numbers(initial_board, solution_board, num_reveals, session)
             print("Puzzle with randomly revealed cells (magenta):")
-            print_board_colored(initial_board, original_board, fully_solved=False)
+            print_board_colored(initial_board, original_board, fully_solved=False, session=session)
 
         elif choice == "2":
             if not difficulty_revealed:
-                difficulty = classify_sudoku_difficulty(recursion_calls, backtracks)
+                stats = solve_stats if solve_stats is not None else solve_board(original_board.copy())
+                difficulty = grade_difficulty(stats)
                 print(f"\nThe difficulty of the puzzle is: {difficulty}")
                 difficulty_revealed = True
             else:
@@ -231,12 +345,12 @@ def interactive_sudoku(initial_board, solution_board):
             print("\nHere is the fully solved puzzle:")
             # In fully solved mode, auto-filled cells appear in green,
             # while user guesses (cyan/red), system reveals (magenta), and pre-filled (white) remain unchanged.
-            print_board_colored(solution_board, original_board, fully_solved=True)
+            print_board_colored(solution_board, original_board, fully_solved=True, session=session)
             break
 
         elif choice == "4":
-            row = int(input("Please enter the row index (0-8): "))
-            col = int(input("Please enter the column index (0-8): "))
+            row = int(input(f"Please enter the row index (0-{size - 1}): "))
+            col = int(input(f"Please enter the column index (0-{size - 1}): "))
 
             # Check against the original board (which remains unchanged) to ensure the cell was originally empty.
             if original_board[row][col] != 0:
@@ -245,54 +359,48 @@ def interactive_sudoku(initial_board, solution_board):
 
             # Allow the user multiple attempts for the same cell.
             while True:
-                test_num = int(input("Enter your guess for the cell (1-9), or 0 to clear the cell: "))
+                test_num = int(input(f"Enter your guess for the cell (1-{size}), or 0 to clear the cell: "))
+                if not 0 <= test_num <= size:
+                    print(f"Please enter a number from 1 to {size}, or 0 to clear the cell.")
+                    continue
+                # The session records the guess (or clears the cell) and keeps the candidates up to date.
+                correct, message = session.enter(row, col, test_num)
+                initial_board[row][col] = test_num
                 if test_num == 0:
-                    # Clear the cell and remove any recorded incorrect guess.
-                    initial_board[row][col] = 0
-                    if (row, col) in incorrect_guess_positions:
-                        incorrect_guess_positions.remove((row, col))
                     print("Cell cleared.")
                     break
-
-                # Compare the guess directly against the solution.
-                correct_num = solution_board[row][col]
-                if test_num == correct_num:
-                    # Correct guess: update the board and record as a correct user guess.
-                    initial_board[row][col] = test_num
-                    if (row, col) not in user_guess_positions:
-                        user_guess_positions.append((row, col))
-                    # If the cell was previously marked as incorrect, remove it.
-                    if (row, col) in incorrect_guess_positions:
-                        incorrect_guess_positions.remove((row, col))
-                    print("\033[96mCorrect! The number is part of the solution.\033[0m\n")
+                if correct:
+                    print(f"\033[96m{message}\033[0m\n")
                     break  # Exit loop since the guess is correct.
-                else:
-                    # Incorrect guess: update board temporarily and record the cell as incorrect.
-                    initial_board[row][col] = test_num
-                    if (row, col) not in incorrect_guess_positions:
-                        incorrect_guess_positions.append((row, col))
-                    print("\033[91mIncorrect! The number is not correct.\033[0m")
-                    print_board_colored(initial_board, original_board, fully_solved=False)
-                    retry = input("Would you like to try again for the same cell? (Y/N): ")
-                    if retry.lower() != 'y':
-                        clear_choice = input("Would you like to clear the cell? (Y/N): ")
-                        if clear_choice.lower() == 'y':
-                            initial_board[row][col] = 0
-                            if (row, col) in incorrect_guess_positions:
-                                incorrect_guess_positions.remove((row, col))
-                        break  # Exit the loop if the user chooses not to retry.
-            print_board_colored(initial_board, original_board, fully_solved=False)
-
-
+                # Incorrect guess: the cell keeps the number, marked incorrect.
+                print(f"\033[91m{message}\033[0m")
+                print_board_colored(initial_board, original_board, fully_solved=False, session=session)
+                retry = input("Would you like to try again for the same cell? (Y/N): ")
+                if retry.lower() != 'y':
+                    clear_choice = input("Would you like to clear the cell? (Y/N): ")
+                    if clear_choice.lower() == 'y':
+                        session.enter(row, col, 0)
+                        initial_board[row][col] = 0
+                    break  # Exit the loop if the user chooses not to retry.
+            print_board_colored(initial_board, original_board, fully_solved=False, session=session)
 
         elif choice == "5":
             from Save_Solution_as_Image import save_as_image
-            save_as_image(original_board, initial_board, solution_board, system_revealed_positions, user_guess_positions, incorrect_guess_positions)
+            save_as_image(original_board, initial_board, solution_board, session.revealed, session.guessed, session.incorrect,
+                          grid_image=grid_image, photo=photo, homography=homography)
 
         elif choice == "6":
             print("Exiting interactive mode...")
             break
 
+        elif choice == "7":
+            hint = session.hint()
+            if hint is None:
+                print("Every cell is already filled in correctly.")
+            else:
+                row, col, digit, reason = hint
+                print(f"Cell ({row}, {col}) must be {digit} ({reason}).")
+
         else:
             print("Invalid input. Try again")
 
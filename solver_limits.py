@@ -0,0 +1,71 @@
+"""
+Limits for a running search.
+
+A SearchBudget is handed to an engine (solve_sudoku.solve_board(board,
+budget=...)) which calls visit() once per search node. visit raises
+SearchInterrupted once the deadline passes, the node budget is spent or the
+CancellationToken is cancelled from another thread, and reports progress
+every progress_interval nodes. solve_sudoku.solve_with_limits and
+solve_sudoku.solve_async wrap this into a SolveResult.
+"""
+import threading
+import time
+
+TIMEOUT = "timeout"
+NODE_BUDGET = "node budget"
+CANCELLED = "cancelled"
+
+
+class SearchInterrupted(Exception):
+    """Raised out of an engine when a limit stops the search. reason is TIMEOUT, NODE_BUDGET or CANCELLED."""
+
+    def __init__(self, reason):
+        super().__init__(f"Search stopped: {reason}")
+        self.reason = reason
+        self.stats = None  # The partial SolveStats, attached by solve_board.
+
+
+class CancellationToken:
+    """Lets another thread (or an asyncio task) stop a search in progress."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class SearchBudget:
+    """
+    Parameters:
+    - timeout: Seconds the search may run, counted from when the budget is created.
+    - max_nodes: Search nodes the search may visit.
+    - cancel: Optional CancellationToken checked at every node.
+    - progress: Optional callback progress(nodes, depth, elapsed_seconds).
+    - progress_interval: Nodes between two progress calls.
+    """
+
+    def __init__(self, timeout=None, max_nodes=None, cancel=None, progress=None, progress_interval=1000):
+        self.started = time.perf_counter()
+        self.deadline = None if timeout is None else self.started + timeout
+        self.max_nodes = max_nodes
+        self.cancel = cancel
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.nodes = 0
+
+    def visit(self, depth):
+        """Called by an engine for every search node; raises SearchInterrupted once a limit is hit."""
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchInterrupted(NODE_BUDGET)
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchInterrupted(TIMEOUT)
+        if self.cancel is not None and self.cancel.cancelled:
+            raise SearchInterrupted(CANCELLED)
+        if self.progress is not None and self.nodes % self.progress_interval == 0:
+            self.progress(self.nodes, depth, time.perf_counter() - self.started)
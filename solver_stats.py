@@ -0,0 +1,72 @@
+"""
+Per-solve statistics.
+
+Every call to solve_sudoku.solve_board fills its own SolveStats, so numbers
+from one solve never leak into another and solves can run concurrently in
+threads or processes. solve_sudoku.solve_with_limits wraps them in a
+SolveResult that also says whether a limit stopped the search.
+"""
+from dataclasses import dataclass, field
+
+
+@dataclass
+class SolveStats:
+    engine: str = ""
+    solved: bool = False
+    nodes: int = 0            # Search nodes visited (recursive calls for the backtracker).
+    backtracks: int = 0       # Placements undone or branches that hit a contradiction.
+    max_depth: int = 0        # Deepest level of the search.
+    propagations: int = 0     # Propagation passes over the board.
+    naked_singles: int = 0    # Cells filled because only one digit fit.
+    hidden_singles: int = 0   # Cells filled because a digit fit nowhere else in a unit.
+    techniques: set = field(default_factory=set)
+    elapsed: float = 0.0      # Wall time in seconds.
+    cached: bool = False      # Answered from a solution_cache.SolutionCache instead of a fresh solve.
+
+    def __bool__(self):
+        # Lets callers keep writing `if solve_board(board):`.
+        return self.solved
+
+    @property
+    def guesses(self):
+        """Branching decisions the search had to make (0 when logic alone was enough)."""
+        return max(self.nodes - 1, 0)
+
+    def to_dict(self):
+        return {
+            "engine": self.engine,
+            "solved": self.solved,
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "max_depth": self.max_depth,
+            "propagations": self.propagations,
+            "naked_singles": self.naked_singles,
+            "hidden_singles": self.hidden_singles,
+            "techniques": sorted(self.techniques),
+            "elapsed": self.elapsed,
+            "cached": self.cached,
+        }
+
+
+@dataclass
+class SolveResult:
+    """Outcome of solve_sudoku.solve_with_limits."""
+    status: str               # "solved", "unsolvable", "budget_exceeded" or "cancelled".
+    solution: object = None   # The solved board (NumPy array) when status is "solved".
+    stats: SolveStats = None
+    reason: str = ""          # Which limit stopped the search (see solver_limits).
+
+    def __bool__(self):
+        return self.status == "solved"
+
+    @property
+    def solved(self):
+        return self.status == "solved"
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "solution": None if self.solution is None else self.solution.tolist(),
+            "stats": self.stats.to_dict() if self.stats is not None else None,
+            "reason": self.reason,
+        }
@@ -0,0 +1,45 @@
+"""
+Startup-time report.
+
+Set SUDOKU_STARTUP_REPORT=1 and the entry points (Combined_full.py,
+quick_solve.py) print, on exit, how long after they started each stage was
+reached and which heavy libraries had been imported by then:
+
+    SUDOKU_STARTUP_REPORT=1 python quick_solve.py test.txt
+
+Interpreter startup itself is not included; for that and for a per-module
+breakdown of import costs use `python -X importtime`.
+This module only uses the standard library so importing it costs nothing.
+"""
+import atexit
+import os
+import sys
+import time
+
+HEAVY_MODULES = ("numpy", "cv2", "PIL", "h5py", "tensorflow")
+
+ENABLED = os.environ.get("SUDOKU_STARTUP_REPORT", "") not in ("", "0")
+
+_BASE = time.perf_counter()
+_marks = []
+
+
+def mark(label):
+    """Records that the process reached a stage (a no-op unless the report is enabled)."""
+    if ENABLED:
+        _marks.append((label, time.perf_counter(), tuple(name for name in HEAVY_MODULES if name in sys.modules)))
+
+
+def report(file=None):
+    """Prints the elapsed time at every mark and the heavy modules loaded by then."""
+    file = file or sys.stderr
+    print("Startup report (times since the entry point started):", file=file)
+    previous = _BASE
+    for label, at, modules in _marks:
+        print(f"  {(at - _BASE) * 1000:8.1f} ms  {label} (+{(at - previous) * 1000:.1f} ms)"
+              f"{'  [' + ', '.join(modules) + ']' if modules else ''}", file=file)
+        previous = at
+
+
+if ENABLED:
+    atexit.register(report)
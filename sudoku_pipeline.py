@@ -0,0 +1,196 @@
+"""
+In-memory image pipeline: photo -> warped grid -> cell crops -> recognized board.
+
+Every stage hands NumPy arrays to the next one, so nothing is written to or
+read back from disk unless a debug directory is given. This keeps concurrent
+runs from clobbering shared file names such as extracted_sudoku.jpg.
+"""
+import os
+
+import cv2
+import numpy as np
+
+import tracing
+from utils_MNIST_Classify import predict_cells_top_k
+
+WARPED_CELL_SIZE = 30   # Pixels per cell in the warped grid (270 x 270 for a 9x9 board).
+CELL_MARGIN = 0.15      # Fraction of each cell side trimmed away to drop the grid lines.
+MIN_DIGIT_AREA = 0.04   # Smallest ink blob, as a fraction of the trimmed cell, that counts as a digit.
+
+def order_corners(points):
+    """Orders four points as top-left, top-right, bottom-right, bottom-left."""
+    points = np.asarray(points, dtype=np.float32).reshape(4, 2)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([points[np.argmin(sums)], points[np.argmin(diffs)],
+                     points[np.argmax(sums)], points[np.argmax(diffs)]], dtype=np.float32)
+
+def binarize(image):
+    """Converts a photo to a white-on-black binary image (digits and grid lines in white)."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    blurred = cv2.GaussianBlur(gray, (9, 9), 0)
+    return cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2)
+
+def find_grid_corners(binary):
+    """Returns the ordered corners of the largest four-sided contour, or None if there is none."""
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4:
+            return order_corners(approx)
+    return None
+
+def warp_grid(binary, corners, size=9):
+    """Warps the grid to a square, top-down view. Returns the warped grid and the homography used."""
+    side = size * WARPED_CELL_SIZE
+    target = np.array([[0, 0], [side - 1, 0], [side - 1, side - 1], [0, side - 1]], dtype=np.float32)
+    homography = cv2.getPerspectiveTransform(corners, target)
+    return cv2.warpPerspective(binary, homography, (side, side)), homography
+
+def extract_grid(image, size=9):
+    """
+    Locates the Sudoku grid of size x size cells in a BGR photo (or grayscale array)
+    and returns (warped_grid, corners, homography). Raises ValueError if no grid is found.
+    """
+    binary = binarize(image)
+    corners = find_grid_corners(binary)
+    if corners is None:
+        raise ValueError("No Sudoku grid found in the image.")
+    warped, homography = warp_grid(binary, corners, size)
+    return warped, corners, homography
+
+def remove_grid_lines(warped):
+    """Erases the grid lines (white runs longer than a cell) from the warped grid, leaving only the digits."""
+    horizontal = cv2.morphologyEx(warped, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (WARPED_CELL_SIZE, 1)))
+    vertical = cv2.morphologyEx(warped, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, WARPED_CELL_SIZE)))
+    lines = cv2.dilate(cv2.bitwise_or(horizontal, vertical), np.ones((3, 3), dtype=np.uint8))
+    return cv2.bitwise_and(warped, cv2.bitwise_not(lines))
+
+def split_cells(warped, size=9):
+    """Cuts the warped grid into size*size cell crops with the grid lines trimmed off."""
+    cell = warped.shape[0] // size
+    margin = int(cell * CELL_MARGIN)
+    crops = [warped[r * cell + margin:(r + 1) * cell - margin, c * cell + margin:(c + 1) * cell - margin]
+             for r in range(size) for c in range(size)]
+    return np.stack(crops)
+
+def isolate_digit(crop):
+    """
+    Keeps only the largest ink blob near the centre of a cell crop and centres it
+    MNIST-style (fitted into 20x20 inside a 28x28 image). Returns None for empty cells.
+    """
+    count, labels, stats, _ = cv2.connectedComponentsWithStats((crop > 127).astype(np.uint8), connectivity=8)
+    height, width = crop.shape
+    best, best_area = 0, MIN_DIGIT_AREA * height * width
+    for k in range(1, count):
+        if stats[k, cv2.CC_STAT_AREA] >= best_area:
+            best, best_area = k, stats[k, cv2.CC_STAT_AREA]
+    if not best:
+        return None
+
+    x, y, w, h = stats[best, :4]
+    digit = np.where(labels[y:y + h, x:x + w] == best, 255, 0).astype(np.uint8)
+    scale = 20.0 / max(w, h)
+    digit = cv2.resize(digit, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    centered = np.zeros((28, 28), dtype=np.uint8)
+    top, left = (28 - digit.shape[0]) // 2, (28 - digit.shape[1]) // 2
+    centered[top:top + digit.shape[0], left:left + digit.shape[1]] = digit
+    return centered
+
+def cells_to_batch(crops):
+    """
+    Prepares cell crops for the classifier.
+    Returns the (N, 28, 28, 1) batch of the non-empty cells (floats in [0, 1]) and a boolean mask of which cells those are.
+    """
+    digits = [isolate_digit(crop) for crop in crops]
+    filled = np.array([digit is not None for digit in digits], dtype=bool)
+    batch = [digit for digit in digits if digit is not None]
+    batch = np.stack(batch).astype(np.float32) / 255.0 if batch else np.empty((0, 28, 28), dtype=np.float32)
+    return batch.reshape(-1, 28, 28, 1), filled
+
+def classify_crops(crops, model, k=3):
+    """
+    Classifies any number of cell crops in one batch, keeping the k most probable labels of each.
+    Returns (labels, probabilities), both shaped (len(crops), k); crops without ink are label 0 with probability 1.
+    """
+    batch, filled = cells_to_batch(crops)
+    labels = np.zeros((len(crops), k), dtype=int)
+    probabilities = np.zeros((len(crops), k), dtype=np.float32)
+    probabilities[:, 0] = 1
+    if filled.any():
+        labels[filled], probabilities[filled] = predict_cells_top_k(batch, model, k)
+    return labels, probabilities
+
+def recognize_cell_candidates(crops, model, k=3, size=9):
+    """
+    Classifies the non-empty cells in one batch, keeping the k most probable labels of each.
+    Returns (labels, probabilities), both shaped (size, size, k) with the most probable label
+    first; cells without ink are label 0 with probability 1.
+    """
+    labels, probabilities = classify_crops(crops, model, k)
+    return labels.reshape(size, size, k), probabilities.reshape(size, size, k)
+
+def threshold_candidates(labels, probabilities, threshold=0.6):
+    """The board of the most probable labels, with the cells below threshold left empty. Returns (board, confidences)."""
+    board, confidences = labels[..., 0].copy(), probabilities[..., 0].copy()
+    board[confidences < threshold] = 0  # Label low-confidence cells as empty
+    return board, confidences
+
+def recognize_cells(crops, model, threshold=0.6, size=9):
+    """
+    Classifies the non-empty cells in one batch.
+    Returns (board, confidences), both shaped (size, size); empty cells are 0 with confidence 1.
+    """
+    return threshold_candidates(*recognize_cell_candidates(crops, model, 1, size), threshold)
+
+def save_debug_images(debug_dir, warped, crops):
+    """Writes the warped grid and the cell crops in the layout the old file-based pipeline used."""
+    digits_dir = os.path.join(debug_dir, "sudoku_digits")
+    os.makedirs(digits_dir, exist_ok=True)
+    cv2.imwrite(os.path.join(debug_dir, "extracted_sudoku.jpg"), warped)
+    for i, crop in enumerate(crops, start=1):
+        cv2.imwrite(os.path.join(digits_dir, f"digit_{i}.png"), crop)
+
+def process_image(image, model, threshold=0.6, debug_dir=None, size=9, top_k=10):
+    """
+    Runs extraction and recognition on one photo without touching the disk.
+
+    Parameters:
+    - image: Path to the photo or an already decoded BGR array.
+    - model: Trained Keras model.
+    - threshold: Probability threshold for empty box classification.
+    - debug_dir: If given, the warped grid and the cell crops are also written there.
+    - size: Cells per side of the grid (9, 16, 25, ...). The MNIST classifier only
+      knows the digits 0-9, so on larger grids the cells holding 10 and up (or letters) are misread.
+    - top_k: Labels kept per cell for confidence_solver.recover_grid (all ten by default).
+
+    Returns a dict with the warped grid (ready for save_as_image), the cell crops,
+    the recognized board with per-cell confidences, the top_k labels of every cell
+    with their probabilities, and the grid corners in the photo.
+    """
+    if isinstance(image, (str, os.PathLike)):
+        path = image
+        with tracing.span("read_image"):
+            image = cv2.imread(os.fspath(path))
+        if image is None:
+            raise ValueError(f"Could not read image {path}.")
+    with tracing.span("extract_grid"):
+        warped, corners, homography = extract_grid(image, size)
+    with tracing.span("split_cells"):
+        crops = split_cells(remove_grid_lines(warped), size)
+    with tracing.span("classify"):
+        candidates, probabilities = recognize_cell_candidates(crops, model, top_k, size)
+        board, confidences = threshold_candidates(candidates, probabilities, threshold)
+    if debug_dir is not None:
+        with tracing.span("save_debug_images"):
+            save_debug_images(debug_dir, warped, crops)
+    return {
+        "warped": warped,
+        "cells": crops,
+        "board": board,
+        "confidences": confidences,
+        "candidates": candidates,
+        "candidate_probabilities": probabilities,
+        "corners": corners,
+        "homography": homography,
+    }
@@ -0,0 +1,417 @@
+"""
+Long-running solver service.
+
+Loads the digit classifier once, keeps it warm, and serves recognition and
+solving over a local HTTP server:
+
+    python sudoku_service.py --port 8080 --workers 8
+
+    POST /solve   with an image body (Content-Type: image/*), or JSON
+                  {"grid": [[...9 ints...] * 9]} / {"grid": "81 chars, 0 or . for empty"}
+                  / {"image": "<base64 encoded photo>"}; 16x16 and 25x25 grids work the same way
+    GET  /health
+    POST /sessions        {"grid": ...} starts an interactive game; returns its "id" and "state"
+    POST /sessions/<id>   {"action": "enter", "row": r, "col": c, "value": v} (0 clears),
+                          {"action": "check", ...}, {"action": "hint"} or {"action": "reveal", "count": n}
+    GET  /sessions/<id>   / DELETE /sessions/<id>
+
+Requests are handled on a bounded worker pool. Cell classification from
+concurrent requests is micro-batched: requests arriving within a few
+milliseconds of each other share one forward pass. Solutions go through a
+solution_cache.SolutionCache, so repeated and symmetric submissions skip the
+solver; /health reports its hit rate. A photo whose recognized grid does not
+have exactly one solution is solved from the most probable reading that does;
+the response then lists the "corrections" ([row, col, read, used]) next to the
+"recognized_grid". With SUDOKU_TRACE set (see tracing), /health also reports
+per-stage timings and counters. Games are sudoku_session.SudokuSession
+objects kept in memory by id (least recently used dropped past --max-sessions).
+"""
+import argparse
+import base64
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+
+import tracing
+
+MODEL_PATH = "trained_model_classification_MNIST.npz"
+
+
+class MicroBatchingModel:
+    """
+    Wraps a Keras model and merges predict_on_batch calls made from different
+    threads into shared forward passes. It exposes the same predict_on_batch
+    method, so it can be handed to the pipeline in place of the model.
+    """
+
+    def __init__(self, model, max_delay=0.005, max_batch_size=1024):
+        self.model = model
+        self.max_delay = max_delay
+        self.max_batch_size = max_batch_size
+        self.forward_passes = 0
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def predict_on_batch(self, batch):
+        """Queues the batch for the next shared forward pass and waits for its rows of the result."""
+        future = Future()
+        self._requests.put((np.asarray(batch, dtype=np.float32), future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            pending = [self._requests.get()]
+            size = len(pending[0][0])
+            deadline = time.perf_counter() + self.max_delay
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            try:
+                probabilities = np.asarray(self.model.predict_on_batch(np.concatenate([batch for batch, _ in pending])))
+                self.forward_passes += 1
+            except Exception as error:  # Hand the failure to every waiting request.
+                for _, future in pending:
+                    future.set_exception(error)
+                continue
+            start = 0
+            for batch, future in pending:
+                future.set_result(probabilities[start:start + len(batch)])
+                start += len(batch)
+
+
+def parse_grid(grid):
+    """
+    Parses a grid given as nested lists or as a string in the puzzle_io text
+    format (81 characters for 9x9, 0 or . for empty); the size follows from the number of cells.
+    """
+    from puzzle_io import board_size_for, parse_puzzle_string
+
+    if isinstance(grid, str):
+        return parse_puzzle_string("".join(grid.split()))
+    board = np.array(grid, dtype=int)
+    size = board_size_for(board.size)
+    if board.min() < 0 or board.max() > size:
+        raise ValueError(f"A {size}x{size} grid must have values 0-{size}.")
+    return board.reshape(size, size)
+
+
+def decode_image(data):
+    """Decodes encoded image bytes (JPEG, PNG, ...) into a BGR array."""
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("The request body is not a readable image.")
+    return image
+
+
+class SudokuService:
+    """Holds the warm model and turns one submission into a JSON-ready result."""
+
+    def __init__(self, model_path=MODEL_PATH, max_batch_delay=0.005, cache=None, solve_timeout=None, max_sessions=10000):
+        from sudoku_session import SessionStore
+        from utils_MNIST_Classify import load_model
+
+        self.cache = cache  # Optional solution_cache.SolutionCache shared by all request threads.
+        self.solve_timeout = solve_timeout  # Seconds a request may spend solving and checking its grid.
+        self.sessions = SessionStore(maxsize=max_sessions)
+
+        started = time.perf_counter()
+        model = load_model(model_path)
+        model.predict_on_batch(np.zeros((1, 28, 28, 1), dtype=np.float32))  # Warm up the graph once.
+        self.model = MicroBatchingModel(model, max_delay=max_batch_delay)
+        self.startup_seconds = time.perf_counter() - started
+
+    def handle(self, image=None, grid=None):
+        from solve_sudoku import count_solutions, grade_difficulty, solve_board
+        from solver_limits import SearchBudget, SearchInterrupted
+
+        timings = {}
+        result = {}
+        if image is not None:
+            from sudoku_pipeline import process_image
+
+            started = time.perf_counter()
+            extraction = process_image(image, self.model)
+            timings["recognize"] = time.perf_counter() - started
+            board = extraction["board"]
+            result["confidences"] = np.round(extraction["confidences"], 4).tolist()
+            board = self._recover(extraction, result, timings)
+        else:
+            board = parse_grid(grid)
+
+        solution = board.copy()
+        started = time.perf_counter()
+        # One budget per request: solving and counting solutions share the deadline.
+        budget = SearchBudget(timeout=self.solve_timeout) if self.solve_timeout else None
+        stats = None
+        try:
+            stats = self.cache.solve(solution, budget=budget) if self.cache is not None else solve_board(solution, budget=budget)
+            result["status"] = "solved" if stats.solved else "unsolvable"
+            # A misread grid usually has no solution or several; report which so clients can reject it.
+            result["solution_count"] = count_solutions(board, budget=budget) if stats.solved else 0
+        except SearchInterrupted as error:
+            if stats is None:  # The solve itself ran out of time.
+                stats = error.stats
+                result["status"] = "budget_exceeded"
+            result["solution_count"] = None  # Unknown; when only counting ran out of time the solution stands.
+        solved = stats.solved
+        timings["solve"] = time.perf_counter() - started
+        result["difficulty"] = grade_difficulty(stats) if solved else None
+        result["stats"] = stats.to_dict()
+
+        result.update({
+            "grid": board.tolist(),
+            "solved": bool(solved),
+            "solution": solution.tolist() if solved else None,
+            "timings": timings,
+        })
+        return result
+
+
+    def start_session(self, grid):
+        """Starts an interactive game on a grid with exactly one solution; returns its id and state."""
+        from solve_sudoku import count_solutions, solve_board
+        from solver_limits import SearchBudget, SearchInterrupted
+
+        board = parse_grid(grid)
+        solution = board.copy()
+        budget = SearchBudget(timeout=self.solve_timeout) if self.solve_timeout else None
+        try:
+            stats = self.cache.solve(solution, budget=budget) if self.cache is not None else solve_board(solution, budget=budget)
+            if not stats.solved or count_solutions(board, budget=budget) != 1:
+                raise ValueError("A game needs a grid with exactly one solution.")
+        except SearchInterrupted:
+            raise ValueError("Could not check the grid in time.") from None
+        session_id, session = self.sessions.create(board, solution)
+        return {"id": session_id, "state": session.to_dict()}
+
+    def session_action(self, session_id, payload):
+        """Applies one move to a game. Raises KeyError for an unknown id and ValueError for a bad move."""
+        action = payload.get("action")
+
+        def apply(session):
+            if action in ("enter", "check"):
+                row, col, value = int(payload["row"]), int(payload["col"]), int(payload["value"])
+                correct, message = (session.enter if action == "enter" else session.check)(row, col, value)
+                result = {"correct": correct, "message": message}
+            elif action == "hint":
+                hint = session.hint()
+                result = {"hint": None if hint is None else dict(zip(("row", "col", "value", "reason"), hint))}
+            elif action == "reveal":
+                result = {"revealed": [list(position) for position in session.reveal(int(payload.get("count", 1)))]}
+            elif action is None:
+                result = {}
+            else:
+                raise ValueError(f"Unknown action {action!r}; expected enter, check, hint or reveal.")
+            result["solved"] = session.solved
+            result["state"] = session.to_dict()
+            return result
+
+        try:
+            return self.sessions.run(session_id, apply)
+        except KeyError as error:
+            if error.args == (session_id,):
+                raise
+            raise ValueError(f"Missing field {error}.") from None
+
+    def _recover(self, extraction, result, timings):
+        """
+        Swaps a recognized grid without exactly one solution for the most probable
+        reading that has one (see confidence_solver), noting the corrected cells in
+        the result. Returns the board to solve.
+        """
+        from confidence_solver import recover_grid
+        from solve_sudoku import count_solutions
+        from solver_limits import SearchBudget, SearchInterrupted
+
+        board = extraction["board"]
+        started = time.perf_counter()
+        try:
+            if count_solutions(board, budget=SearchBudget(max_nodes=2000)) == 1:
+                return board
+        except SearchInterrupted:
+            pass
+        recovered = recover_grid(extraction["candidates"], extraction["candidate_probabilities"],
+                                 timeout=self.solve_timeout or 5.0)
+        timings["recover"] = time.perf_counter() - started
+        if recovered is None:
+            return board
+        result["recognized_grid"] = board.tolist()
+        result["corrections"] = [[int(v) for v in correction] for correction in recovered.corrections]
+        return recovered.board
+
+
+class SolverRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SudokuService/1.0"
+
+    def do_GET(self):
+        if self.path.startswith("/sessions/"):
+            self._session_request({})
+            return
+        if self.path != "/health":
+            self._send_json(404, {"error": "Not found."})
+            return
+        service = self.server.service
+        health = {"status": "ok", "startup_seconds": service.startup_seconds, "forward_passes": service.model.forward_passes,
+                  "sessions": len(service.sessions)}
+        if service.cache is not None:
+            health["cache"] = service.cache.metrics()
+        if tracing.ENABLED:
+            health["trace"] = tracing.metrics()
+        self._send_json(200, health)
+
+    def do_POST(self):
+        if self.path == "/sessions" or self.path.startswith("/sessions/"):
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError as error:
+                self._send_json(400, {"error": str(error)})
+                return
+            self._session_request(payload)
+            return
+        if self.path != "/solve":
+            self._send_json(404, {"error": "Not found."})
+            return
+        started = time.perf_counter()
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.headers.get("Content-Type", "").startswith("image/"):
+                result = self.server.service.handle(image=decode_image(body))
+            else:
+                payload = json.loads(body or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("Submit a JSON object with an 'image' or 'grid' field.")
+                if "image" in payload:
+                    result = self.server.service.handle(image=decode_image(base64.b64decode(payload["image"])))
+                elif "grid" in payload:
+                    result = self.server.service.handle(grid=payload["grid"])
+                else:
+                    raise ValueError("Submit an image body or JSON with an 'image' or 'grid' field.")
+        except ValueError as error:  # Also covers malformed JSON and base64.
+            self._send_json(400, {"error": str(error)})
+            return
+        except Exception as error:
+            self._send_json(500, {"error": f"{type(error).__name__}: {error}"})
+            return
+        result["timings"]["total"] = time.perf_counter() - started
+        self._send_json(200, result)
+
+    def do_DELETE(self):
+        if not self.path.startswith("/sessions/"):
+            self._send_json(404, {"error": "Not found."})
+            return
+        deleted = self.server.service.sessions.delete(self.path[len("/sessions/"):])
+        self._send_json(200 if deleted else 404, {"deleted": deleted} if deleted else {"error": "Unknown session."})
+
+    def _session_request(self, payload):
+        service = self.server.service
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "Submit a JSON object."})
+            return
+        try:
+            if self.path == "/sessions":
+                if "grid" not in payload:
+                    raise ValueError("Submit JSON with a 'grid' field.")
+                result = service.start_session(payload["grid"])
+            else:
+                result = service.session_action(self.path[len("/sessions/"):], payload)
+        except KeyError:
+            self._send_json(404, {"error": "Unknown session."})
+            return
+        except (TypeError, ValueError) as error:  # TypeError for fields of the wrong type, e.g. "row": null.
+            self._send_json(400, {"error": str(error)})
+            return
+        except Exception as error:
+            self._send_json(500, {"error": f"{type(error).__name__}: {error}"})
+            return
+        self._send_json(200, result)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTP server that handles each connection on a bounded thread pool."""
+
+    def __init__(self, address, service, workers=4, quiet=False):
+        super().__init__(address, SolverRequestHandler)
+        self.service = service
+        self.quiet = quiet
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="solver")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Sudoku recognition and solving service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="Number of requests handled concurrently.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--max-batch-delay-ms", type=float, default=5.0,
+                        help="How long the first request in a batch waits for others to join it.")
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request.")
+    parser.add_argument("--solve-timeout", type=float, default=5.0,
+                        help="Seconds a request may spend searching before it is answered with status budget_exceeded (0 for no limit).")
+    parser.add_argument("--cache-size", type=int, default=4096, help="Solutions kept in memory (0 disables the cache).")
+    parser.add_argument("--cache-file", help="SQLite file that keeps cached solutions across restarts.")
+    parser.add_argument("--max-sessions", type=int, default=10000, help="Interactive games kept in memory.")
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.cache_size > 0:
+        from solution_cache import SolutionCache
+        cache = SolutionCache(maxsize=args.cache_size, path=args.cache_file)
+    service = SudokuService(args.model, max_batch_delay=args.max_batch_delay_ms / 1000, cache=cache,
+                            solve_timeout=args.solve_timeout or None, max_sessions=args.max_sessions)
+    server = PooledHTTPServer((args.host, args.port), service, workers=args.workers, quiet=args.quiet)
+    print(f"Model loaded in {service.startup_seconds:.2f} seconds. Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        server.server_close()
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
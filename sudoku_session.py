@@ -0,0 +1,384 @@
+"""
+State of one interactive game.
+
+A SudokuSession holds the puzzle, its solution, the board as the player
+sees it and where every filled cell came from (given, revealed, guessed
+right, guessed wrong). Like the bitmask solver, every row, column and box
+keeps a bitmask of the correct digits placed in it, and the candidates of
+every empty cell, the number of places left for each digit in each unit and
+the pending naked and hidden singles are kept up to date as cells are
+filled or cleared. A move touches only the peers of its cell, so checking a
+guess or asking for the next hint does not rescan the board:
+
+    session = SudokuSession(board, solution)
+    session.enter(0, 2, 4)        # (True, "Correct! ...")
+    session.hint()                # (row, col, digit, "naked single")
+    state = session.to_dict()     # JSON-ready; SudokuSession.from_dict(state) restores it
+
+Sessions are independent objects, so one process can host any number of
+them; SessionStore keeps them by id for the service.
+"""
+import random
+import threading
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from math import isqrt
+
+import numpy as np
+
+from bitmask_solver import _bits, _layout, solve_cells
+from puzzle_io import CELL_SYMBOLS
+
+UNIT_NAMES = ("row", "column", "box")
+
+
+@lru_cache(maxsize=None)
+def _peers(box):
+    """For every cell, the other cells that share its row, column or box."""
+    _, _, _, _, _, units = _layout(box)
+    size = box * box
+    peers = [set() for _ in range(size ** 4)]
+    for unit in units:
+        for idx in unit:
+            peers[idx].update(unit)
+    return [tuple(sorted(cell_peers - {idx})) for idx, cell_peers in enumerate(peers)]
+
+
+def _flat(board):
+    """A board given as nested lists, a NumPy array or a flat list, as a flat list of ints."""
+    return np.asarray(board, dtype=int).ravel().tolist()
+
+
+class SudokuSession:
+    """
+    One player's game.
+
+    Parameters:
+    - board: The puzzle (nested lists, NumPy array or flat list, 0 for empty).
+    - solution: Its solution in the same form; solved with the bitmask engine when omitted.
+
+    Raises ValueError if the board is not square or has no solution.
+    """
+
+    __slots__ = ("size", "box", "original", "solution", "board", "revealed", "guessed", "incorrect",
+                 "_placed", "_masks", "_cands", "_places", "_naked", "_hidden", "_remaining")
+
+    def __init__(self, board, solution=None):
+        original = _flat(board)
+        size = isqrt(len(original))
+        box = isqrt(size)
+        if size * size != len(original) or box * box != size:
+            raise ValueError(f"Expected a square board with a square side length, got {len(original)} cells")
+        solution = solve_cells(original, box) if solution is None else _flat(solution)
+        if solution is None:
+            raise ValueError("The puzzle has no solution.")
+        if len(solution) != len(original) or any(given and given != value for given, value in zip(original, solution)):
+            raise ValueError("The solution does not match the givens of the board.")
+
+        self.size, self.box = size, box
+        self.original = original
+        self.solution = solution
+        self.board = list(original)  # What the player sees, wrong guesses included.
+        self.revealed, self.guessed, self.incorrect = set(), set(), set()  # (row, col) positions.
+
+        _, full, row_of, col_of, box_of, units = _layout(box)
+        self._placed = list(original)  # Correct digits only; the constraints hints are derived from.
+        self._masks = [0] * (3 * size)  # Rows, then columns, then boxes.
+        for idx, digit in enumerate(original):
+            if digit:
+                bit = 1 << (digit - 1)
+                for u in (row_of[idx], size + col_of[idx], 2 * size + box_of[idx]):
+                    self._masks[u] |= bit
+        self._cands = [0 if digit else full & ~self._used(idx) for idx, digit in enumerate(original)]
+        self._places = [0] * (3 * size * size)  # Unit * size + digit - 1 -> empty cells of the unit the digit fits.
+        for u, unit in enumerate(units):
+            for idx in unit:
+                for bit in _bits(self._cands[idx]):
+                    self._places[u * size + bit.bit_length() - 1] += 1
+        self._naked = {idx for idx, mask in enumerate(self._cands) if mask and not mask & (mask - 1)}
+        self._hidden = {key for key, count in enumerate(self._places) if count == 1}
+        self._remaining = original.count(0)
+
+    def _units(self, idx):
+        _, _, row_of, col_of, box_of, _ = _layout(self.box)
+        return row_of[idx], self.size + col_of[idx], 2 * self.size + box_of[idx]
+
+    def _used(self, idx):
+        r, c, b = self._units(idx)
+        return self._masks[r] | self._masks[c] | self._masks[b]
+
+    def _drop(self, idx, bit):
+        """Takes bit out of the candidates of idx and out of the place counts of its units."""
+        self._cands[idx] ^= bit
+        mask = self._cands[idx]
+        if mask and not mask & (mask - 1):
+            self._naked.add(idx)
+        digit = bit.bit_length() - 1
+        for u in self._units(idx):
+            key = u * self.size + digit
+            self._places[key] -= 1
+            if self._places[key] == 1:
+                self._hidden.add(key)
+
+    def _add(self, idx, bit):
+        self._cands[idx] |= bit
+        mask = self._cands[idx]
+        if not mask & (mask - 1):
+            self._naked.add(idx)
+        digit = bit.bit_length() - 1
+        for u in self._units(idx):
+            key = u * self.size + digit
+            self._places[key] += 1
+            if self._places[key] == 1:
+                self._hidden.add(key)
+
+    def _place(self, idx):
+        """Records the solution digit of idx as placed and updates its peers."""
+        digit = self.solution[idx]
+        bit = 1 << (digit - 1)
+        for candidate in _bits(self._cands[idx]):
+            self._drop(idx, candidate)
+        self._placed[idx] = digit
+        for u in self._units(idx):
+            self._masks[u] |= bit
+        for peer in _peers(self.box)[idx]:
+            if self._cands[peer] & bit:
+                self._drop(peer, bit)
+        self._remaining -= 1
+
+    def _unplace(self, idx):
+        """Undoes _place: the digit becomes a candidate again wherever nothing else rules it out."""
+        bit = 1 << (self._placed[idx] - 1)
+        self._placed[idx] = 0
+        for u in self._units(idx):
+            self._masks[u] ^= bit
+        for peer in _peers(self.box)[idx]:
+            if not self._placed[peer] and not self._used(peer) & bit:
+                self._add(peer, bit)
+        _, full, _, _, _, _ = _layout(self.box)
+        for candidate in _bits(full & ~self._used(idx)):
+            self._add(idx, candidate)
+        self._remaining += 1
+
+    def _index(self, row, col):
+        if not (0 <= row < self.size and 0 <= col < self.size):
+            raise ValueError(f"Cell ({row}, {col}) is outside the {self.size}x{self.size} board.")
+        return row * self.size + col
+
+    @property
+    def solved(self):
+        """True once every cell holds its correct digit."""
+        return self._remaining == 0
+
+    def origin(self, row, col):
+        """Where the value of a cell came from: "given", "guessed", "incorrect", "revealed" or None (empty)."""
+        if self.original[row * self.size + col]:
+            return "given"
+        position = (row, col)
+        if position in self.guessed:
+            return "guessed"
+        if position in self.incorrect:
+            return "incorrect"
+        if position in self.revealed:
+            return "revealed"
+        return None
+
+    def candidates(self, row, col):
+        """The digits that still fit an empty cell, given the correct digits placed so far."""
+        return [bit.bit_length() for bit in _bits(self._cands[self._index(row, col)])]
+
+    def check(self, row, col, num):
+        """
+        Checks a digit for a cell without entering it. Returns (correct, message);
+        a wrong digit that clashes with a placed one says where.
+        """
+        idx = self._index(row, col)
+        if self.original[idx]:
+            return False, "This cell was pre-filled in the original puzzle. Choose an empty cell."
+        if not 1 <= num <= self.size:
+            raise ValueError(f"Digits on a {self.size}x{self.size} board are 1-{self.size}, got {num}.")
+        if num == self.solution[idx]:
+            return True, "Correct! The number is part of the solution."
+        bit = 1 << (num - 1)
+        for name, u in zip(UNIT_NAMES, self._units(idx)):
+            if self._masks[u] & bit:
+                return False, f"Incorrect! The number {num} already exists in this {name}."
+        return False, "Incorrect! The number is not correct."
+
+    def enter(self, row, col, num):
+        """
+        Enters a guess (0 clears the cell) and returns (correct, message) like check.
+        A wrong guess stays on the board, marked incorrect, until it is replaced or cleared.
+        """
+        idx = self._index(row, col)
+        if num == 0:
+            if self.original[idx]:
+                return False, "This cell was pre-filled in the original puzzle. Choose an empty cell."
+            if self._placed[idx]:
+                self._unplace(idx)
+            self.board[idx] = 0
+            self.guessed.discard((row, col))
+            self.incorrect.discard((row, col))
+            self.revealed.discard((row, col))
+            return True, "Cell cleared."
+
+        correct, message = self.check(row, col, num)
+        if self.original[idx]:
+            return correct, message
+        self.board[idx] = num
+        if correct:
+            if not self._placed[idx]:
+                self._place(idx)
+            self.guessed.add((row, col))
+            self.incorrect.discard((row, col))
+        else:
+            if self._placed[idx]:
+                self._unplace(idx)
+            self.guessed.discard((row, col))
+            self.incorrect.add((row, col))
+        self.revealed.discard((row, col))
+        return correct, message
+
+    def reveal(self, count, rng=random):
+        """Fills count random unsolved cells with their solution digits; returns their (row, col) positions."""
+        available = [idx for idx, digit in enumerate(self._placed) if not digit]
+        positions = []
+        for idx in rng.sample(available, min(count, len(available))):
+            self._place(idx)
+            self.board[idx] = self.solution[idx]
+            position = divmod(idx, self.size)
+            self.incorrect.discard(position)
+            self.revealed.add(position)
+            positions.append(position)
+        return positions
+
+    def hint(self):
+        """
+        The next deduction from the correct digits placed so far, as
+        (row, col, digit, reason): a naked single, a hidden single, or, when
+        neither is left, the solution digit of the cell with the fewest
+        candidates (reason "fewest candidates"). None once the board is full.
+        """
+        while self._naked:
+            idx = next(iter(self._naked))
+            mask = self._cands[idx]
+            if not self._placed[idx] and mask and not mask & (mask - 1):
+                return (*divmod(idx, self.size), mask.bit_length(), "naked single")
+            self._naked.discard(idx)
+
+        _, _, _, _, _, units = _layout(self.box)
+        while self._hidden:
+            key = next(iter(self._hidden))
+            u, digit = divmod(key, self.size)
+            bit = 1 << digit
+            if self._places[key] == 1 and not self._masks[u] & bit:
+                idx = next(idx for idx in units[u] if self._cands[idx] & bit)
+                return (*divmod(idx, self.size), digit + 1, f"hidden single in {UNIT_NAMES[u // self.size]}")
+            self._hidden.discard(key)
+
+        if not self._remaining:
+            return None
+        idx = min((idx for idx, digit in enumerate(self._placed) if not digit), key=lambda idx: self._cands[idx].bit_count())
+        return (*divmod(idx, self.size), self.solution[idx], "fewest candidates")
+
+    def to_dict(self):
+        """The session as JSON-ready data: boards in the puzzle_io text format and positions as cell indices."""
+        def text(cells):
+            return "".join(CELL_SYMBOLS[value] for value in cells)
+
+        def indices(positions):
+            return sorted(row * self.size + col for row, col in positions)
+
+        return {
+            "size": self.size,
+            "original": text(self.original),
+            "solution": text(self.solution),
+            "board": text(self.board),
+            "revealed": indices(self.revealed),
+            "guessed": indices(self.guessed),
+            "incorrect": indices(self.incorrect),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuilds a session saved with to_dict. Raises ValueError if the data does
+        not describe a consistent game (values out of range, a solution that is
+        not a filled grid, or marks that do not match the board).
+        """
+        size = data["size"]
+        symbols = CELL_SYMBOLS[:size + 1] if isinstance(size, int) and 0 < size < len(CELL_SYMBOLS) else ""
+
+        def cells(text):
+            if len(text) != size * size or any(symbol not in symbols for symbol in text):
+                raise ValueError(f"Expected {size * size} cells with values 0-{size}." if symbols else f"Invalid size {size!r}.")
+            return [symbols.index(symbol) for symbol in text]
+
+        original, solution, board = cells(data["original"]), cells(data["solution"]), cells(data["board"])
+        session = cls(original, solution)
+        _, full, _, _, _, units = _layout(session.box)
+        if any(sum(1 << (solution[idx] - 1) for idx in unit if solution[idx]) != full for unit in units):
+            raise ValueError("The solution is not a filled-in grid.")
+        marks = {name: set(data[name]) for name in ("revealed", "guessed", "incorrect")}
+        marked = set().union(*marks.values())
+        if sum(map(len, marks.values())) != len(marked) or any(not 0 <= idx < size * size or original[idx] for idx in marked):
+            raise ValueError("Revealed, guessed and incorrect cells must be distinct empty cells of the puzzle.")
+        for idx, value in enumerate(board):
+            if idx in marks["incorrect"]:
+                consistent = value and value != solution[idx]
+            elif idx in marked:
+                consistent = value == solution[idx]
+            else:
+                consistent = value == original[idx]
+            if not consistent:
+                raise ValueError(f"Cell {divmod(idx, size)} holds {value}, which does not match its marks.")
+
+        for idx in (*data["revealed"], *data["guessed"]):
+            session._place(idx)
+            session.board[idx] = board[idx]
+        for idx in data["incorrect"]:
+            session.board[idx] = board[idx]
+        session.revealed = {divmod(idx, session.size) for idx in data["revealed"]}
+        session.guessed = {divmod(idx, session.size) for idx in data["guessed"]}
+        session.incorrect = {divmod(idx, session.size) for idx in data["incorrect"]}
+        return session
+
+
+class SessionStore:
+    """
+    Sessions by id for a long-running server, least recently used dropped
+    first once there are more than maxsize. Thread-safe: every call on a
+    session goes through run, which holds the store's lock for the (short) move.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, board, solution=None):
+        """Starts a session and returns (id, session)."""
+        session = SudokuSession(board, solution)
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return session_id, session
+
+    def run(self, session_id, action):
+        """Calls action(session) under the lock and returns its result. Raises KeyError for an unknown id."""
+        with self._lock:
+            session = self._sessions[session_id]
+            self._sessions.move_to_end(session_id)
+            return action(session)
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
@@ -0,0 +1,439 @@
+"""
+Streaming mode over a video file or a directory of frames.
+
+    python sudoku_stream.py capture.mp4
+    python sudoku_stream.py frames/ --output frames.jsonl --render annotated/
+    python sudoku_stream.py capture.mp4 --fps 30 --quiet       # summary only
+
+A capture rig sees the same grid for many frames in a row, so GridStream
+keeps the last frame's grid and redoes only what changed:
+
+- unchanged: the grid, resampled at PROBE_CELL pixels per cell through the
+  last homography, differs from the last processed frame by less than
+  STILL_THRESHOLD in every cell. Nothing else runs and the last result stands.
+- tracked: the grid moved. Its corners are followed with pyramidal
+  Lucas-Kanade optical flow (checked forwards and backwards) instead of
+  being searched for again, and only the region around the grid is binarized.
+- detected: the grid is located from scratch, as in process_image. This
+  happens on the first frame, when tracking fails, and every redetect_every
+  frames so small tracking errors do not add up.
+
+Either way only the cells whose binarized crop changed by more than
+CELL_CHANGE are classified again, and the board is solved again only when a
+recognized digit changed (through confidence_solver when the reading does not
+have exactly one solution). Solving a misread board can take seconds, so by default it runs
+in a separate process: frames keep coming at full rate, marked "solving"
+and without a solution, until the new one is ready; --sync solves inside
+the frame instead. Every frame is reported with its status, the cells it
+classified and per-stage timings; the summary shows the latency percentiles
+and how many frames missed the frame budget (1 / --fps, or the video's own
+rate).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+import tracing
+from sudoku_pipeline import (WARPED_CELL_SIZE, binarize, classify_crops, find_grid_corners, remove_grid_lines,
+                             split_cells, threshold_candidates)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+MODEL_PATH = "trained_model_classification_MNIST.npz"
+
+PROBE_CELL = 8            # Pixels per cell of the low-resolution grid view used to spot changes.
+STILL_THRESHOLD = 6.0     # Mean absolute change (grey levels) of every probe cell below which a frame is unchanged.
+CELL_CHANGE = 0.08        # Fraction of a cell crop's pixels that must flip before the cell is classified again.
+TRACK_ERROR = 1.0         # Forward-backward optical flow error (pixels) above which the grid is located from scratch.
+ROI_MARGIN = 16           # Pixels around the grid binarized with it, so the blur and the threshold see the same neighbourhood.
+
+
+@dataclass
+class FrameResult:
+    index: int
+    source: str
+    status: str                    # "unchanged", "tracked", "detected" or "no_grid".
+    board: np.ndarray = None       # The recognized board (0 for empty), None without a grid.
+    solution: np.ndarray = None    # Its solution, None if it has none or is still being solved.
+    cells_classified: int = 0
+    resolved: bool = False         # True if the board changed on this frame, so it is being solved again.
+    solving: bool = False          # True while the solution of the current board is still being computed.
+    corrections: list = field(default_factory=list)  # (row, col, read, used) from confidence_solver.
+    homography: np.ndarray = None  # Photo to warped grid, for solution_renderer.render_on_photos.
+    timings: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        return {
+            "frame": self.index,
+            "source": self.source,
+            "status": self.status,
+            "grid": self.board.tolist() if self.board is not None else None,
+            "solved": self.solution is not None,
+            "solution": self.solution.tolist() if self.solution is not None else None,
+            "cells_classified": self.cells_classified,
+            "resolved": self.resolved,
+            "solving": self.solving,
+            "corrections": [[int(v) for v in correction] for correction in self.corrections],
+            "timings": self.timings,
+        }
+
+
+def solve_reading(board, labels, probabilities, timeout):
+    """
+    Solves a recognized board that has exactly one solution, falling back to the
+    most probable reading that does (see confidence_solver). Returns
+    (solution or None, corrections).
+    """
+    from confidence_solver import recover_grid
+    from solve_sudoku import count_solutions, solve_with_limits
+    from solver_limits import SearchBudget, SearchInterrupted
+
+    result = solve_with_limits(board, timeout=timeout)
+    if result.status == "budget_exceeded":
+        return None, []
+    count = 0
+    if result.status == "solved":
+        try:
+            count = count_solutions(board, budget=SearchBudget(timeout=timeout))
+        except SearchInterrupted:
+            count = None
+        if count == 1:
+            return result.solution, []
+    # A misread grid usually has no solution or several.
+    recovered = recover_grid(labels, probabilities, timeout=timeout)
+    if recovered is not None:
+        return recovered.solution, recovered.corrections
+    # An arbitrary one of several solutions is not the puzzle's; one that could not be counted may still be.
+    return (result.solution if count is None else None), []
+
+
+def _target(size):
+    side = size * WARPED_CELL_SIZE
+    return np.array([[0, 0], [side - 1, 0], [side - 1, side - 1], [0, side - 1]], dtype=np.float32)
+
+
+def _plausible(corners, shape):
+    """True if four corners form a convex quadrilateral of reasonable size inside the frame."""
+    height, width = shape[:2]
+    if not ((corners[:, 0] >= 0) & (corners[:, 0] < width) & (corners[:, 1] >= 0) & (corners[:, 1] < height)).all():
+        return False
+    return cv2.isContourConvex(corners.reshape(-1, 1, 2)) and cv2.contourArea(corners) > 0.01 * height * width
+
+
+class GridStream:
+    """
+    Recognizes and solves the grid of consecutive frames, reusing the work
+    of the previous frame where the grid has not moved or changed.
+
+    Parameters:
+    - model: Digit classifier (see utils_MNIST_Classify.load_model).
+    - size: Cells per side of the grid.
+    - threshold: Probability below which a cell counts as empty.
+    - top_k: Labels kept per cell for confidence_solver.recover_grid.
+    - timeout: Seconds to spend solving or recovering one board.
+    - redetect_every: Locate the grid from scratch after this many tracked frames.
+    - executor: Optional concurrent.futures executor to solve boards on (see
+      the module docstring); without one boards are solved inside the frame.
+    """
+
+    def __init__(self, model, size=9, threshold=0.6, top_k=10, timeout=5.0, redetect_every=30, executor=None):
+        self.model = model
+        self.size = size
+        self.threshold = threshold
+        self.top_k = top_k
+        self.timeout = timeout
+        self.redetect_every = redetect_every
+        self.executor = executor
+        self.reset()
+
+    def reset(self):
+        """Forgets the grid, so the next frame is processed from scratch."""
+        self._gray = None
+        self._corners = None
+        self._probe = None
+        self._crops = None
+        self._labels = None
+        self._probabilities = None
+        self._tracked = 0
+        self._homography = None
+        self._board = None
+        self._solution = None
+        self._corrections = []
+        self._pending = None  # Future of the solve of _board, when it runs on the executor.
+
+    def process(self, frame, index=0, source=""):
+        """Recognizes and solves one BGR (or grayscale) frame. Returns a FrameResult."""
+        started = time.perf_counter()
+        timings = {}
+        with tracing.span("stream.frame"):
+            result = self._process(frame, index, source, timings)
+            if self._pending is not None and self._pending.done():
+                self._collect()
+            result.solution, result.corrections = self._solution, self._corrections
+            result.solving = self._pending is not None
+        timings["total"] = time.perf_counter() - started
+        result.timings = timings
+        tracing.count(f"stream.{result.status}")
+        return result
+
+    def _process(self, frame, index, source, timings):
+        started = time.perf_counter()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self._board is not None:
+            probe = self._probe_view(gray, self._corners)
+            if self._cell_changes(probe, self._probe).max() < STILL_THRESHOLD:
+                timings["probe"] = time.perf_counter() - started
+                return FrameResult(index, source, "unchanged", self._board, homography=self._homography)
+        timings["probe"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        status, corners = "detected", None
+        if self._corners is not None and self._tracked < self.redetect_every:
+            corners = self._track(gray)
+            status = "tracked"
+        if corners is None:
+            status = "detected"
+            with tracing.span("stream.detect"):
+                corners = find_grid_corners(binarize(gray))
+        timings["locate"] = time.perf_counter() - started
+        if corners is None:
+            if self._pending is not None:
+                self._pending.cancel()
+            self.reset()
+            return FrameResult(index, source, "no_grid")
+        self._tracked = self._tracked + 1 if status == "tracked" else 0
+
+        started = time.perf_counter()
+        warped, homography = self._warp(gray, corners)
+        crops = split_cells(remove_grid_lines(warped), self.size)
+        timings["warp"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        if self._crops is None:
+            changed = np.arange(len(crops))
+        else:
+            flipped = (crops > 127) != (self._crops > 127)
+            changed = np.flatnonzero(flipped.mean(axis=(1, 2)) > CELL_CHANGE)
+        if self._labels is None:
+            self._labels = np.zeros((len(crops), self.top_k), dtype=int)
+            self._probabilities = np.zeros((len(crops), self.top_k), dtype=np.float32)
+        if len(changed):
+            with tracing.span("stream.classify", cells=len(changed)):
+                self._labels[changed], self._probabilities[changed] = classify_crops(crops[changed], self.model, self.top_k)
+            self._crops = crops if self._crops is None else self._crops
+            self._crops[changed] = crops[changed]  # Unchanged cells keep the crop they were classified from.
+        timings["classify"] = time.perf_counter() - started
+
+        labels = self._labels.reshape(self.size, self.size, self.top_k)
+        probabilities = self._probabilities.reshape(self.size, self.size, self.top_k)
+        board, _ = threshold_candidates(labels, probabilities, self.threshold)
+
+        result = FrameResult(index, source, status, board, cells_classified=len(changed), homography=homography)
+        if self._board is None or not np.array_equal(board, self._board):
+            started = time.perf_counter()
+            self._solve(board, labels.copy(), probabilities.copy())
+            result.resolved = True
+            timings["solve"] = time.perf_counter() - started
+
+        self._gray = gray
+        self._corners = corners
+        self._homography = homography
+        self._probe = self._probe_view(gray, corners)
+        return result
+
+    def _probe_view(self, gray, corners):
+        side = self.size * PROBE_CELL
+        target = np.array([[0, 0], [side - 1, 0], [side - 1, side - 1], [0, side - 1]], dtype=np.float32)
+        return cv2.warpPerspective(gray, cv2.getPerspectiveTransform(corners, target), (side, side),
+                                   flags=cv2.INTER_AREA)
+
+    def _cell_changes(self, probe, previous):
+        """Mean absolute difference of every cell between two probe views, as a (size, size) array."""
+        difference = cv2.absdiff(probe, previous).astype(np.float32)
+        return difference.reshape(self.size, PROBE_CELL, self.size, PROBE_CELL).mean(axis=(1, 3))
+
+    def _track(self, gray):
+        """The grid corners followed from the last processed frame, or None if they cannot be trusted."""
+        with tracing.span("stream.track"):
+            previous = self._corners.reshape(-1, 1, 2)
+            params = dict(winSize=(31, 31), maxLevel=4,
+                          criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01))
+            forward, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, previous, None, **params)
+            if forward is None or not status.all():
+                return None
+            backward, status, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, forward, None, **params)
+            if backward is None or not status.all() or np.abs(backward - previous).max() > TRACK_ERROR:
+                return None
+            corners = forward.reshape(4, 2).astype(np.float32)
+            return corners if _plausible(corners, gray.shape) else None
+
+    def _warp(self, gray, corners):
+        """
+        Binarizes only the region around the grid and warps it to the top-down view.
+        Returns (warped binary grid, photo-to-grid homography).
+        """
+        height, width = gray.shape[:2]
+        x0, y0 = np.maximum(np.floor(corners.min(axis=0)).astype(int) - ROI_MARGIN, 0)
+        x1, y1 = np.minimum(np.ceil(corners.max(axis=0)).astype(int) + ROI_MARGIN + 1, (width, height))
+        binary = binarize(gray[y0:y1, x0:x1])
+        target = _target(self.size)
+        local = cv2.getPerspectiveTransform((corners - (x0, y0)).astype(np.float32), target)
+        side = self.size * WARPED_CELL_SIZE
+        warped = cv2.warpPerspective(binary, local, (side, side))
+        return warped, cv2.getPerspectiveTransform(corners, target)
+
+    def _solve(self, board, labels, probabilities):
+        """Starts solving a newly recognized board (or solves it, without an executor)."""
+        if self._pending is not None:
+            self._pending.cancel()  # Its board is gone; a solve that already started just runs out.
+        self._board, self._solution, self._corrections, self._pending = board, None, [], None
+        if self.executor is None:
+            try:
+                self._solution, self._corrections = solve_reading(board, labels, probabilities, self.timeout)
+            except Exception as error:
+                print(f"Solving the grid failed ({type(error).__name__}: {error}); waiting for the next reading.", file=sys.stderr)
+        else:
+            self._pending = self.executor.submit(solve_reading, board, labels, probabilities, self.timeout)
+
+    def _collect(self):
+        """
+        Takes the result of the finished background solve. A solve that failed
+        (e.g. a worker crash or an unexpected error in the reading) is reported
+        on stderr and leaves the grid without a solution instead of stopping the stream.
+        """
+        pending, self._pending = self._pending, None
+        try:
+            self._solution, self._corrections = pending.result()
+        except Exception as error:
+            print(f"Solving the grid failed ({type(error).__name__}: {error}); waiting for the next reading.", file=sys.stderr)
+            self._solution, self._corrections = None, []
+
+    def finish(self):
+        """Waits for the solve in progress, if any. Returns (board, solution, corrections) of the last grid."""
+        if self._pending is not None:
+            self._collect()
+        return self._board, self._solution, self._corrections
+
+
+def iter_frames(source):
+    """
+    Yields (index, name, frame) for every frame of a video file, or for every
+    image of a directory in natural order (1.jpg, 2.jpg, ..., 10.jpg).
+    """
+    if os.path.isdir(source):
+        names = [name for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS)]
+        names.sort(key=lambda name: (len(name), name))
+        for index, name in enumerate(names):
+            frame = cv2.imread(os.path.join(source, name))
+            if frame is not None:
+                yield index, name, frame
+        return
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {source}.")
+    try:
+        index = 0
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield index, f"{os.path.basename(source)}#{index}", frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def video_fps(source):
+    """The frame rate a video file declares, or None for a directory or an unknown rate."""
+    if os.path.isdir(source):
+        return None
+    capture = cv2.VideoCapture(source)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS)
+    finally:
+        capture.release()
+    return fps if fps and fps > 0 else None
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recognize and solve the Sudoku grid in a video or a directory of frames.")
+    parser.add_argument("source", help="Video file or directory of frame images.")
+    parser.add_argument("--model", default=MODEL_PATH, help="Exported .npz classifier, or a .keras model to run with TensorFlow.")
+    parser.add_argument("--size", type=int, default=9, help="Cells per side of the grid.")
+    parser.add_argument("--fps", type=float, help="Frame rate to hold (default: the video's own, or 30).")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds to spend solving one board.")
+    parser.add_argument("--sync", action="store_true", help="Solve inside the frame instead of in a separate process.")
+    parser.add_argument("--redetect-every", type=int, default=30, help="Locate the grid from scratch after this many tracked frames.")
+    parser.add_argument("--max-frames", type=int, help="Stop after this many frames.")
+    parser.add_argument("--output", help="Write one JSON line per frame here.")
+    parser.add_argument("--render", metavar="DIR", help="Draw the solution onto every solved frame and write it to DIR.")
+    parser.add_argument("--quiet", action="store_true", help="Print only the summary.")
+    args = parser.parse_args(argv)
+
+    from utils_MNIST_Classify import load_model
+
+    fps = args.fps or video_fps(args.source) or 30.0
+    budget = 1.0 / fps
+    executor = None if args.sync else ProcessPoolExecutor(max_workers=1)
+    stream = GridStream(load_model(args.model), size=args.size, timeout=args.timeout, redetect_every=args.redetect_every,
+                        executor=executor)
+    if args.render:
+        from solution_renderer import render_on_photos, write_images
+
+        os.makedirs(args.render, exist_ok=True)
+    output = open(args.output, "w") if args.output else None
+
+    latencies, counts, over_budget = [], {}, 0
+    started = time.perf_counter()
+    try:
+        for index, name, frame in iter_frames(args.source):
+            if args.max_frames is not None and index >= args.max_frames:
+                break
+            result = stream.process(frame, index, name)
+            latency = result.timings["total"]
+            latencies.append(latency)
+            counts[result.status] = counts.get(result.status, 0) + 1
+            over_budget += latency > budget
+            if args.render and result.solution is not None:
+                started_render = time.perf_counter()
+                image = render_on_photos([result.board], [result.solution], [frame], [result.homography])[0]
+                write_images([image], [os.path.join(args.render, f"{index:06d}.jpg")])
+                result.timings["render"] = time.perf_counter() - started_render
+            if output is not None:
+                output.write(json.dumps(result.to_dict()) + "\n")
+            if not args.quiet:
+                print(f"frame {index:5d}  {result.status:<9}  {latency * 1000:7.2f} ms  "
+                      f"{result.cells_classified:3d} cells classified  "
+                      f"{'solving' if result.solving else 'solved' if result.solution is not None else 'unsolved'}"
+                      f"{'  (new board)' if result.resolved else ''}")
+        board, solution, _ = stream.finish()
+    finally:
+        if output is not None:
+            output.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    frames = len(latencies)
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"{frames} frames in {elapsed:.2f} seconds ({frames / elapsed if elapsed else 0:.1f} frames/s): {summary}", file=sys.stderr)
+    print(f"latency p50 {_percentile(latencies, 50):.2f} ms  p90 {_percentile(latencies, 90):.2f} ms  "
+          f"p99 {_percentile(latencies, 99):.2f} ms  max {_percentile(latencies, 100):.2f} ms; "
+          f"{over_budget} frames over the {budget * 1000:.1f} ms budget of {fps:g} fps", file=sys.stderr)
+    if board is not None:
+        print(f"last grid: {'solved' if solution is not None else 'no solution found'}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Checks that confidence_solver.recover_grid repairs misread cells from their
+runner-up labels.
+
+    python -m pytest -q
+"""
+import numpy as np
+
+from bitmask_solver import count_cells
+from confidence_solver import recover_grid
+from puzzle_io import parse_puzzle_string
+from test_solvers import EASY, is_valid_solution
+
+
+def readings(board, k=3):
+    """
+    Top-k labels and probabilities like sudoku_pipeline.recognize_cell_candidates
+    gives for a clean photo: cells without ink are empty for sure, digits are
+    read with 0.98 and two other digits share the rest.
+    """
+    size = len(board)
+    labels = np.zeros((size, size, k), dtype=int)
+    probabilities = np.zeros((size, size, k))
+    probabilities[..., 0] = 1.0
+    for row, col in zip(*np.nonzero(board)):
+        digit = board[row, col]
+        labels[row, col] = [digit, digit % size + 1, (digit + 1) % size + 1]
+        probabilities[row, col] = [0.98, 0.01, 0.01]
+    return labels, probabilities
+
+
+def test_clean_reading_is_kept():
+    board = parse_puzzle_string(EASY)
+    recovered = recover_grid(*readings(board))
+    assert (recovered.board == board).all()
+    assert recovered.corrections == []
+    assert is_valid_solution(board, recovered.solution)
+
+
+def test_runner_up_label_fixes_an_unsolvable_reading():
+    board = parse_puzzle_string(EASY)
+    labels, probabilities = readings(board)
+    # The 5 in the top-left corner is read as a 1 (which clashes with no given) and the 5 comes second.
+    labels[0, 0], probabilities[0, 0] = [1, 5, 2], [0.7, 0.25, 0.05]
+    misread = labels[..., 0] * (probabilities[..., 0] > 0.5)
+    assert count_cells(misread.ravel().tolist()) == 0
+
+    recovered = recover_grid(labels, probabilities)
+    assert (recovered.board == board).all()
+    assert recovered.corrections == [(0, 0, 1, 5)]
+    assert is_valid_solution(board, recovered.solution)
+
+
+def test_stray_mark_is_dropped():
+    board = parse_puzzle_string(EASY)
+    labels, probabilities = readings(board)
+    # A smudge in an empty cell read as a 5, which clashes with the 5 in its row.
+    labels[0, 2], probabilities[0, 2] = [5, 0, 6], [0.6, 0.3, 0.1]
+    recovered = recover_grid(labels, probabilities)
+    assert (recovered.board == board).all()
+    assert recovered.corrections == [(0, 2, 5, 0)]
+
+
+def test_no_reading_with_a_unique_solution():
+    labels, probabilities = readings(np.zeros((9, 9), dtype=int))
+    assert recover_grid(labels, probabilities, timeout=1.0) is None
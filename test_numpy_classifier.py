@@ -0,0 +1,62 @@
+"""
+Checks that the NumPy forward pass of numpy_classifier gives the Keras model's
+probabilities for cells cut from extracted_sudoku.jpg.
+
+    python -m pytest -q
+"""
+import cv2
+import numpy as np
+import pytest
+
+from numpy_classifier import KERAS_MODEL_PATH, NUMPY_MODEL_PATH, NumpyClassifier, export_keras_weights
+from sudoku_pipeline import binarize, cells_to_batch, remove_grid_lines, split_cells
+
+# Keras probabilities for a few cells of extracted_sudoku.jpg, by cell index; confident and borderline ones alike.
+KERAS_PROBABILITIES = {
+    0: [0.3536, 0.0000, 0.6464, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000],
+    1: [0.0001, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.9985, 0.0000, 0.0014, 0.0000],
+    4: [0.0000, 1.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000],
+    10: [0.9107, 0.0000, 0.0893, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000],
+    12: [0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.1931, 0.0000, 0.8069, 0.0000],
+    26: [0.0000, 0.3223, 0.0000, 0.0001, 0.6776, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000],
+    33: [0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0098, 0.9901],
+    53: [0.0000, 0.0642, 0.0000, 0.9198, 0.0159, 0.0001, 0.0000, 0.0000, 0.0000, 0.0000],
+}
+# Keras labels for all 81 cells.
+KERAS_LABELS = [2, 6, 2, 2, 1, 2, 2, 2, 2,
+                6, 0, 0, 8, 0, 0, 0, 0, 0,
+                0, 1, 0, 0, 0, 0, 0, 0, 4,
+                0, 0, 0, 0, 0, 0, 9, 0, 0,
+                0, 0, 0, 8, 6, 0, 8, 0, 0,
+                0, 0, 0, 0, 8, 0, 6, 1, 3,
+                1, 6, 0, 8, 0, 0, 0, 0, 0,
+                0, 0, 8, 0, 0, 0, 0, 0, 6,
+                0, 2, 6, 2, 6, 2, 1, 2, 2]
+
+
+@pytest.fixture(scope="module")
+def batch():
+    image = cv2.imread("extracted_sudoku.jpg")
+    cells, filled = cells_to_batch(split_cells(remove_grid_lines(binarize(image))))
+    assert cells.shape == (81, 28, 28, 1) and filled.all()
+    return cells
+
+
+def test_bundled_weights_match_keras_outputs(batch):
+    probabilities = NumpyClassifier(NUMPY_MODEL_PATH).predict_on_batch(batch)
+    assert probabilities.argmax(axis=1).tolist() == KERAS_LABELS
+    indices = list(KERAS_PROBABILITIES)
+    np.testing.assert_allclose(probabilities[indices], list(KERAS_PROBABILITIES.values()), atol=1e-3)
+
+
+def test_export_reproduces_bundled_weights(batch, tmp_path):
+    pytest.importorskip("h5py")
+    exported = export_keras_weights(KERAS_MODEL_PATH, str(tmp_path / "model.npz"))
+    np.testing.assert_allclose(NumpyClassifier(exported).predict_on_batch(batch),
+                               NumpyClassifier(NUMPY_MODEL_PATH).predict_on_batch(batch), atol=1e-6)
+
+
+def test_forward_pass_matches_keras(batch):
+    keras = pytest.importorskip("tensorflow").keras
+    expected = np.asarray(keras.models.load_model(KERAS_MODEL_PATH).predict_on_batch(batch))
+    np.testing.assert_allclose(NumpyClassifier(NUMPY_MODEL_PATH).predict_on_batch(batch), expected, atol=1e-5)
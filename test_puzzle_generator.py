@@ -0,0 +1,53 @@
+"""
+Checks that puzzle_generator makes unique puzzles in the requested band and
+clue symmetry.
+
+    python -m pytest -q
+"""
+import random
+
+import pytest
+
+from bitmask_solver import count_cells
+from puzzle_generator import DIFFICULTIES, SYMMETRIES, generate_puzzle, generate_puzzles, grade_cells, symmetry_orbits
+
+
+@pytest.mark.parametrize("symmetry", SYMMETRIES)
+def test_symmetry_orbits_partition_the_board(symmetry):
+    orbits = symmetry_orbits(9, symmetry)
+    assert sorted(idx for orbit in orbits for idx in orbit) == list(range(81))
+    if symmetry == "rotational":
+        assert [0, 80] in orbits and [40] in orbits
+    elif symmetry == "none":
+        assert len(orbits) == 81
+
+
+def test_unknown_symmetry_and_difficulty():
+    with pytest.raises(ValueError):
+        symmetry_orbits(9, "spiral")
+    with pytest.raises(ValueError):
+        generate_puzzle(random.Random(0), "Fiendish")
+
+
+@pytest.mark.parametrize("difficulty", DIFFICULTIES)
+@pytest.mark.parametrize("symmetry", ["none", "rotational", "diagonal", "mirror"])
+def test_generated_puzzle(difficulty, symmetry):
+    generated = generate_puzzle(random.Random(1), difficulty, symmetry)
+    assert generated is not None
+    puzzle, solution, grade = generated
+    assert grade == difficulty == grade_cells(puzzle, 3)
+    assert count_cells(puzzle) == 1
+    assert all(value in (0, solution[idx]) for idx, value in enumerate(puzzle))
+    for orbit in symmetry_orbits(9, symmetry):
+        assert len({bool(puzzle[idx]) for idx in orbit}) == 1  # Every orbit is kept or removed as a whole.
+
+
+def test_seeded_generation_is_reproducible():
+    first = list(generate_puzzles(4, seed=7, workers=1, batch_size=2))
+    assert first == list(generate_puzzles(4, seed=7, workers=1, batch_size=2))
+    assert len(first) == 4
+
+
+def test_unreachable_band_stops_short():
+    # A 4x4 puzzle never needs a guess, so none is ever graded Hard.
+    assert list(generate_puzzles(3, "Hard", box=2, workers=1, seed=0)) == []
@@ -0,0 +1,76 @@
+"""
+Checks the text and packed puzzle formats of puzzle_io.
+
+    python -m pytest -q
+"""
+import numpy as np
+import pytest
+
+from puzzle_io import (PACKED_HEADER, board_to_string, load_packed_boards, parse_puzzle_string, read_puzzles,
+                       write_packed_puzzles, write_text_puzzles)
+
+EASY = "530070000600195000098000060800060003400803001700020006060000280000419005000080079"
+
+
+def random_boards(size, count=5, seed=0):
+    """Boards of arbitrary cell values 0..size; the formats do not care whether they are valid puzzles."""
+    return np.random.default_rng(seed).integers(0, size + 1, size=(count, size, size))
+
+
+@pytest.mark.parametrize("size", [4, 9, 16, 25])
+def test_text_and_packed_round_trip(tmp_path, size):
+    boards = random_boards(size)
+    assert write_text_puzzles(tmp_path / "puzzles.txt", boards) == len(boards)
+    assert write_packed_puzzles(tmp_path / "puzzles.sdkp", boards, size=size) == len(boards)
+    for name in ("puzzles.txt", "puzzles.sdkp"):
+        records = list(read_puzzles(str(tmp_path / name)))
+        assert [record.error for record in records] == [None] * len(boards)
+        assert [record.index for record in records] == list(range(len(boards)))
+        assert (np.stack([record.board for record in records]) == boards).all()
+    assert (load_packed_boards(tmp_path / "puzzles.sdkp", start=1, count=2) == boards[1:3]).all()
+
+
+@pytest.mark.parametrize("size", [9, 16, 25])
+def test_text_size_is_inferred_per_line(tmp_path, size):
+    board = random_boards(size, count=1)[0]
+    text = board_to_string(board)
+    assert len(text) == size * size
+    path = tmp_path / "mixed.txt"
+    path.write_text(f"{EASY} rated easy\n{text}\n")
+    first, second = read_puzzles(str(path))
+    assert first.board.shape == (9, 9) and (second.board == board).all()
+    assert (parse_puzzle_string(text) == board).all()
+
+
+def test_text_errors_are_reported_per_record(tmp_path):
+    path = tmp_path / "puzzles.txt"
+    path.write_text("# a comment\n"
+                    f"{EASY}\n"
+                    "\n"
+                    "12345\n"                               # Not a square board.
+                    f"{EASY[:-1]}X\n"                       # X is not a 9x9 value.
+                    f"{EASY.replace('0', '.')} 3.2\n")     # Dots for empty cells and a trailing rating.
+    records = list(read_puzzles(str(path)))
+    assert [(record.index, record.line) for record in records] == [(0, 2), (1, 4), (2, 5), (3, 6)]
+    assert [record.board is None for record in records] == [False, True, True, False]
+    assert "81, 256, 625" in records[1].error and "values 1-9" in records[2].error
+    assert (records[3].board == records[0].board).all()
+    with pytest.raises(ValueError):
+        parse_puzzle_string(EASY, size=16)
+
+
+def test_packed_errors_are_reported_per_record(tmp_path):
+    path = tmp_path / "puzzles.sdkp"
+    boards = random_boards(9, count=3)
+    write_packed_puzzles(path, boards)
+    data = bytearray(path.read_bytes())
+    data[PACKED_HEADER.size + 41] = 0xF0  # First cell of the second record becomes 15.
+    path.write_bytes(bytes(data) + b"\x00")  # And a truncated record follows the last one.
+    records = list(read_puzzles(str(path)))
+    assert [record.error is None for record in records] == [True, False, True, False]
+    assert records[1].error == "Cell values must be 0-9." and records[3].error.startswith("Truncated")
+    assert records[1].line is None and records[3].index == 3
+
+    (tmp_path / "other.sdkp").write_bytes(b"NOPE" + bytes(8))
+    with pytest.raises(ValueError):
+        list(read_puzzles(str(tmp_path / "other.sdkp")))
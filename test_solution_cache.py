@@ -0,0 +1,77 @@
+"""
+Checks that solution_cache finds symmetric variants of a puzzle and maps the
+cached solution back into each variant's orientation.
+
+    python -m pytest -q
+"""
+import numpy as np
+import pytest
+
+from puzzle_io import parse_puzzle_string
+from solution_cache import SolutionCache, canonical_form, restore
+from test_solvers import EASY, HARD, SIXTEEN, UNSOLVABLE, is_valid_solution
+
+
+def variant(board, seed):
+    """A random equivalent puzzle: digits relabeled, maybe transposed, bands, stacks and the lines in them shuffled."""
+    rng = np.random.default_rng(seed)
+    size = len(board)
+    box = int(round(size ** 0.5))
+
+    def line_order():
+        return np.concatenate([band * box + rng.permutation(box) for band in rng.permutation(box)])
+
+    digits = np.concatenate([[0], rng.permutation(size) + 1])
+    board = digits[board]
+    if rng.integers(2):
+        board = board.T
+    return board[np.ix_(line_order(), line_order())]
+
+
+@pytest.mark.parametrize("text", [EASY, HARD, SIXTEEN])
+@pytest.mark.parametrize("seed", range(5))
+def test_canonical_form_is_shared_by_variants(text, seed):
+    board = parse_puzzle_string(text)
+    other = variant(board, seed)
+    canonical, transform = canonical_form(board)
+    other_canonical, other_transform = canonical_form(other)
+    assert (canonical == other_canonical).all()
+    assert (restore(canonical, transform) == board).all()
+    assert (restore(other_canonical, other_transform) == other).all()
+
+
+@pytest.mark.parametrize("text", [EASY, HARD])
+def test_cached_solutions_are_restored_for_variants(tmp_path, text):
+    path = str(tmp_path / "solutions.sqlite")
+    board = parse_puzzle_string(text)
+    cache = SolutionCache(maxsize=10, path=path)
+    first = board.copy()
+    assert cache.solve(first).solved and not cache.metrics()["hits"]
+    for seed in range(5):
+        other = variant(board, seed)
+        solution = other.copy()
+        stats = cache.solve(solution)
+        assert stats.solved and stats.cached
+        assert is_valid_solution(other, solution)
+    assert cache.metrics()["hits"] == 5 and cache.metrics()["misses"] == 1
+    cache.close()
+
+    # A fresh cache on the same file answers from SQLite instead of the in-memory LRU.
+    cache = SolutionCache(maxsize=10, path=path)
+    other = variant(board, 99)
+    solution = other.copy()
+    assert cache.solve(solution).cached
+    assert is_valid_solution(other, solution)
+    assert cache.metrics()["disk_hits"] == 1 and cache.metrics()["misses"] == 0
+    cache.close()
+
+
+def test_unsolvable_puzzles_are_cached_too():
+    cache = SolutionCache(maxsize=10)
+    board = parse_puzzle_string(UNSOLVABLE)
+    for seed in range(3):
+        other = variant(board, seed)
+        solution = other.copy()
+        assert not cache.solve(solution).solved
+        assert (solution == other).all()
+    assert cache.metrics()["hits"] == 2
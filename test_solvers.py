@@ -0,0 +1,157 @@
+"""
+Checks the solver engines against puzzles with a known number of solutions.
+
+    python -m pytest -q
+"""
+import numpy as np
+import pytest
+
+import bitmask_solver
+import dlx_solver
+from batch_solver import solve_boards
+from puzzle_io import parse_puzzle_string
+from solve_sudoku import solve_board, solve_with_limits
+from solver_limits import CANCELLED, NODE_BUDGET, TIMEOUT, CancellationToken, SearchBudget, SearchInterrupted
+
+EASY = "530070000600195000098000060800060003400803001700020006060000280000419005000080079"
+# Needs many guesses; no engine finishes it in a handful of nodes.
+HARD = "800000000003600000070090200050007000000045700000100030001000068008500010090000400"
+SIXTEEN = ("00700001F0000000000000304A05E00C00C020003D00100A08F450G009E060005C00004000G0000000G3970000062F0090"
+           "0700051200C8000F060308B0570000GE000B0601030C0406000904000000G8800F10D02000030020003C000F0070D1000"
+           "005E0DG0000020000C4029078A00G00090A00000086500G00000000C00000")
+SIXTEEN_SOLUTION = ("B37G4EA1F62C958D129D68374AB5EGFC65CE2F9B3D8G174AA8F45DGC79E162B35C81E24FA3G9DB67EBG3971DC8462FA594"
+                    "A7G6B512FDC83EDF26A3C8BE57G419GEDA7B568193FC24361CF92457DEBAG8874F1GDE2CAB5396295B3C8AGF647ED17A68B5"
+                    "E3DG1F49C2FD35C4629B78A1EGC1B9DA7GE432865F4GE281F965CA3D7B")
+# 1-8 across the top row leave only 9 for its first cell, which the 9 below it rules out.
+UNSOLVABLE = "012345678900000000000000000000000000000000000000000000000000000000000000000000000"
+# Two 5s in the first row.
+CONTRADICTORY = "550070000600195000098000060800060003400803001700020006060000280000419005000080079"
+# EASY without the 5, 3 and 7 of its first row.
+AMBIGUOUS = "000000000600195000098000060800060003400803001700020006060000280000419005000080079"
+
+PUZZLES = {
+    "easy": (EASY, 1),
+    "hard": (HARD, 1),
+    "unsolvable": (UNSOLVABLE, 0),
+    "contradictory": (CONTRADICTORY, 0),
+    "ambiguous": (AMBIGUOUS, 2),
+    "empty": ("0" * 81, 2),
+    "sixteen": (SIXTEEN, 1),
+    "empty_sixteen": ("0" * 256, 2),
+}
+ENGINES = ("bitmask", "dlx")
+
+
+def is_valid_solution(puzzle, solution):
+    """True if the solution keeps the puzzle's givens and every row, column and box holds each value once."""
+    size = len(solution)
+    box = int(round(size ** 0.5))
+    values = set(range(1, size + 1))
+    if ((puzzle != 0) & (puzzle != solution)).any():
+        return False
+    boxes = solution.reshape(box, box, box, box).swapaxes(1, 2).reshape(size, size)
+    return all(set(line) == values for lines in (solution, solution.T, boxes) for line in lines)
+
+
+@pytest.mark.parametrize("name", PUZZLES)
+def test_engines_agree_on_solution_counts(name):
+    text, expected = PUZZLES[name]
+    board = parse_puzzle_string(text)
+    box = int(round(len(board) ** 0.5))
+    assert bitmask_solver.count_cells(board.ravel().tolist(), box) == expected
+    assert dlx_solver.count_solutions(board) == expected
+
+
+@pytest.mark.parametrize("name", PUZZLES)
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_solve(name, engine):
+    text, count = PUZZLES[name]
+    puzzle = parse_puzzle_string(text)
+    board = puzzle.copy()
+    stats = solve_board(board, engine)
+    assert stats.solved == (count > 0)
+    if count:
+        assert is_valid_solution(puzzle, board)
+    else:
+        assert (board == puzzle).all()
+
+
+def test_solve_cells_leaves_its_input_alone():
+    grid = parse_puzzle_string(EASY).ravel().tolist()
+    solution = bitmask_solver.solve_cells(grid)
+    assert grid == parse_puzzle_string(EASY).ravel().tolist()
+    assert is_valid_solution(parse_puzzle_string(EASY), parse_puzzle_string("".join(map(str, solution))))
+
+
+@pytest.mark.parametrize("name", [name for name, (_, count) in PUZZLES.items() if count == 1])
+def test_engines_find_the_same_unique_solution(name):
+    boards = {}
+    for engine in ENGINES:
+        boards[engine] = parse_puzzle_string(PUZZLES[name][0])
+        solve_board(boards[engine], engine)
+    assert (boards["bitmask"] == boards["dlx"]).all()
+
+
+def test_sixteen_by_sixteen_solution():
+    board = parse_puzzle_string(SIXTEEN)
+    solve_board(board)
+    assert (board == parse_puzzle_string(SIXTEEN_SOLUTION)).all()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("limits, reason", [
+    ({"max_nodes": 1}, NODE_BUDGET),
+    ({"timeout": 0.0}, TIMEOUT),
+])
+def test_budget_interrupts_search(engine, limits, reason):
+    board = parse_puzzle_string(HARD)
+    with pytest.raises(SearchInterrupted) as caught:
+        solve_board(board, engine, budget=SearchBudget(**limits))
+    assert caught.value.reason == reason
+    assert caught.value.stats is not None and not caught.value.stats.solved
+
+
+def test_counting_respects_budget():
+    board = parse_puzzle_string("0" * 81)
+    with pytest.raises(SearchInterrupted):
+        bitmask_solver.count_cells(board.ravel().tolist(), 3, budget=SearchBudget(max_nodes=1))
+    with pytest.raises(SearchInterrupted):
+        dlx_solver.count_solutions(board, budget=SearchBudget(max_nodes=1))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_solve_with_limits_statuses(engine):
+    board = parse_puzzle_string(HARD)
+    assert solve_with_limits(board, engine, max_nodes=1).status == "budget_exceeded"
+    cancel = CancellationToken()
+    cancel.cancel()
+    result = solve_with_limits(board, engine, cancel=cancel)
+    assert result.status == "cancelled" and result.reason == CANCELLED
+    result = solve_with_limits(board, engine)
+    assert result.status == "solved" and is_valid_solution(board, result.solution)
+    assert (board == parse_puzzle_string(HARD)).all()  # Only the copy is solved.
+    assert solve_with_limits(parse_puzzle_string(UNSOLVABLE), engine).status == "unsolvable"
+
+
+def test_batch_solver_agrees_with_bitmask_engine():
+    names = [name for name, (text, _) in PUZZLES.items() if len(text) == 81]
+    names += names[::-1]  # Repeats, in a different order, so boards are not all alone in their state.
+    boards = np.stack([parse_puzzle_string(PUZZLES[name][0]) for name in names])
+    solutions, solved = solve_boards(boards)
+    for board, solution, ok in zip(boards, solutions, solved):
+        expected = bitmask_solver.solve_cells(board.ravel().tolist())
+        assert ok == (expected is not None)
+        if ok:
+            assert is_valid_solution(board, solution)
+        else:
+            assert (solution == board).all()
+        if expected is not None and bitmask_solver.count_cells(board.ravel().tolist()) == 1:
+            assert solution.ravel().tolist() == expected
+    assert solved.tolist() == [PUZZLES[name][1] > 0 for name in names]
+
+
+def test_batch_solver_chunks():
+    boards = np.stack([parse_puzzle_string(text) for text in (EASY, UNSOLVABLE, HARD, CONTRADICTORY, EASY)])
+    whole, whole_solved = solve_boards(boards)
+    chunked, chunked_solved = solve_boards(boards, chunk_size=2)
+    assert (whole == chunked).all() and whole_solved.tolist() == chunked_solved.tolist() == [True, False, True, False, True]
@@ -1,7 +1,21 @@
-from PIL import Image
 import numpy as np
 
+import tracing
+
+def load_model(model_path):
+    """
+    Loads the digit classifier.
+    A .npz file exported by numpy_classifier runs on NumPy alone; anything else is loaded with TensorFlow/Keras.
+    """
+    if str(model_path).endswith(".npz"):
+        from numpy_classifier import NumpyClassifier
+        return NumpyClassifier(model_path)
+    from tensorflow.keras.models import load_model as load_keras_model
+    return load_keras_model(model_path)
+
 def predict_user_image(image_path, model):
+    from PIL import Image
+
     # Load the image
     img = Image.open(image_path).convert('L')  # Convert to grayscale
     img = img.resize((28, 28))  # Resize to 28x28 pixels
@@ -28,6 +42,8 @@ def predict_user_image_with_empty_check(image_path, model, threshold=0.6):
     Returns:
     - Predicted label (int).
     """
+    from PIL import Image
+
     # Load and preprocess the image
     img = Image.open(image_path).convert('L')  # Convert to grayscale
     img = img.resize((28, 28))  # Resize to 28x28 pixels
@@ -45,4 +61,71 @@ def predict_user_image_with_empty_check(image_path, model, threshold=0.6):
     if max_prob < threshold:
         return 0  # Label as empty
     else:
-        return predicted_label
\ No newline at end of file
+        return predicted_label
+
+def _predict_probabilities(cells, model, batch_size=None):
+    """Runs the cells through the model in as few forward passes as possible. Returns (probabilities, leading shape)."""
+    cells = np.asarray(cells, dtype=np.float32)
+    if cells.shape[-1] == 1:
+        cells = cells[..., 0]
+    if cells.shape[-2:] != (28, 28):
+        raise ValueError(f"Expected cells of shape (..., 28, 28[, 1]), got {cells.shape}")
+    leading_shape = cells.shape[:-2]
+    batch = cells.reshape(-1, 28, 28, 1)
+
+    if len(batch) == 0:
+        probabilities = np.empty((0, 10), dtype=np.float32)
+    elif batch_size is None or len(batch) <= batch_size:
+        with tracing.span("classify.forward", cells=len(batch)):
+            probabilities = np.asarray(model.predict_on_batch(batch))
+    else:
+        with tracing.span("classify.forward", cells=len(batch)):
+            probabilities = np.concatenate([np.asarray(model.predict_on_batch(batch[start:start + batch_size]))
+                                            for start in range(0, len(batch), batch_size)])
+    tracing.count("cells_classified", len(batch))
+    return probabilities, leading_shape
+
+def predict_cells_with_empty_check(cells, model, threshold=0.6, batch_size=None):
+    """
+    Classifies many cells with one forward pass instead of one model.predict per cell.
+    Cells whose highest probability is below the threshold are labelled empty (0).
+
+    Parameters:
+    - cells: Preprocessed cells of shape (..., 28, 28) or (..., 28, 28, 1), e.g. (81, 28, 28, 1)
+      for one puzzle or (num_puzzles, 81, 28, 28, 1) for several puzzles stacked together.
+    - model: Trained Keras model.
+    - threshold: Probability threshold for empty box classification.
+    - batch_size: Optional cap on cells per forward pass for very large stacks.
+      By default all cells go through the model in a single pass.
+
+    Returns:
+    - labels: Predicted labels (int) with the leading shape of cells, e.g. (81,) or (num_puzzles, 81).
+    - confidences: Highest class probability for every cell, same shape as labels.
+    """
+    labels, confidences = predict_cells_top_k(cells, model, 1, batch_size)
+    labels, confidences = labels[..., 0], confidences[..., 0]
+    labels[confidences < threshold] = 0  # Label low-confidence cells as empty
+    return labels, confidences
+
+def predict_cells_top_k(cells, model, k=3, batch_size=None):
+    """
+    Classifies many cells with one forward pass instead of one model.predict per cell,
+    keeping the k most probable labels of every cell.
+
+    Parameters:
+    - cells: Preprocessed cells of shape (..., 28, 28) or (..., 28, 28, 1), e.g. (81, 28, 28, 1)
+      for one puzzle or (num_puzzles, 81, 28, 28, 1) for several puzzles stacked together.
+    - model: Trained Keras model.
+    - k: Labels kept per cell.
+    - batch_size: Optional cap on cells per forward pass for very large stacks.
+      By default all cells go through the model in a single pass.
+
+    Returns:
+    - labels: The k most probable labels per cell, most probable first, shaped (..., k).
+    - probabilities: Their probabilities, same shape as labels.
+    """
+    probabilities, leading_shape = _predict_probabilities(cells, model, batch_size)
+    k = min(k, probabilities.shape[1])
+    labels = np.argsort(-probabilities, axis=1, kind="stable")[:, :k]
+    top = np.take_along_axis(probabilities, labels, axis=1)
+    return labels.reshape(*leading_shape, k), top.reshape(*leading_shape, k)